@@ -0,0 +1,246 @@
+"""Бенчмарки конвертації на синтетичних даних: python -m bench segments|pipeline|scratch [...]"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from engine import (BACKENDS, DEFAULT_MEMORY_LIMIT, JOBS_DIR, FfmpegBackend, JobSpec, get_ffmpeg_exe, parse_format,
+                    probe_media, run_jobs, warm_up)
+
+# Синтетичні джерела: контейнер, аудіокодек, частота, чи є відеодоріжка
+MEDIA_CASES = [
+    ("mp4", "aac", 44100, True),
+    ("mp4", "aac", 48000, True),
+    ("mkv", "libopus", 48000, True),
+    ("m4a", "aac", 44100, False),
+    ("mp3", "libmp3lame", 44100, False),
+]
+
+def make_synthetic_audio(path, seconds, rate=48000):
+    """Генерує тон з шумом у AAC, щоб кодеру було що стискати."""
+    subprocess.run([get_ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-y",
+                    "-f", "lavfi", "-i", f"sine=frequency=220:sample_rate={rate}:beep_factor=3",
+                    "-f", "lavfi", "-i", f"anoisesrc=amplitude=0.05:sample_rate={rate}",
+                    "-filter_complex", "[0][1]amix=inputs=2,aformat=channel_layouts=stereo",
+                    "-t", str(seconds), "-c:a", "aac", "-b:a", "128k", path], check=True)
+
+def make_synthetic_media(path, seconds, rate, audio_codec, video):
+    """Тон з шумом і, за потреби, тестове відео 320x240 - схоже на типовий завантажений ролик."""
+    cmd = [get_ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-y",
+           "-f", "lavfi", "-i", f"sine=frequency=220:sample_rate={rate}:beep_factor=3",
+           "-f", "lavfi", "-i", f"anoisesrc=amplitude=0.05:sample_rate={rate}"]
+    if video:
+        cmd += ["-f", "lavfi", "-i", "testsrc2=size=320x240:rate=25"]
+    cmd += ["-filter_complex", "[0][1]amix=inputs=2,aformat=channel_layouts=stereo[a]", "-map", "[a]"]
+    if video:
+        cmd += ["-map", "2:v", "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p"]
+    cmd += ["-c:a", audio_codec, "-b:a", "128k", "-ar", str(rate), "-t", str(seconds), path]
+    subprocess.run(cmd, check=True)
+
+def case_name(container, codec, rate, video):
+    return f"{container}-{codec.replace('lib', '')}-{rate // 1000}k" + ("-video" if video else "")
+
+def worker_counts(limit):
+    counts = []
+    n = 1
+    while n < limit:
+        counts.append(n)
+        n *= 2
+    counts.append(limit)
+    return counts
+
+def bench_segments(args):
+    backend = FfmpegBackend()
+    cores = os.cpu_count() or 1
+    with tempfile.TemporaryDirectory(prefix="vtm-bench-") as tmp_dir:
+        source = os.path.join(tmp_dir, "source.m4a")
+        make_synthetic_audio(source, args.minutes * 60)
+        media = probe_media(source)
+        duration, rate = media.duration, media.rate
+        print(f"Джерело: {args.minutes} хв синтетичного AAC, ядер: {cores}")
+        print(f"{'сегментів':>10} {'час, с':>8} {'прискорення':>12}")
+        baseline = None
+        for workers in worker_counts(args.max_workers or cores):
+            out_path = os.path.join(tmp_dir, f"out-{workers}.mp3")
+            started = time.perf_counter()
+            # Сегменти викликаємо напряму, щоб поріг SEGMENT_MIN_DURATION не заважав коротким замірам
+            if workers == 1:
+                backend.extract(source, out_path, 0.0, lambda p: None, segment_workers=1)
+            else:
+                backend.extract_segmented(source, out_path, duration, rate, workers, lambda p: None)
+            elapsed = time.perf_counter() - started
+            baseline = baseline or elapsed
+            print(f"{workers:>10} {elapsed:>8.2f} {baseline / elapsed:>11.2f}x")
+
+def run_one(args):
+    """Один замір в окремому процесі: той самий шлях, що й у вікні (JobQueue -> extract_audio)."""
+    BACKENDS[:] = [backend for backend in BACKENDS if backend.name == args.backend]
+    warm_up()  # Імпорти не входять у замір
+    try:
+        import resource
+    except ImportError:
+        resource = None  # Windows: лише процесорний час цього процесу, без дочірніх ffmpeg
+    before = (resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)) if resource else None
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    job = run_jobs([JobSpec(args.source, args.output_dir, args.trim)], lambda job: None)[0]
+    result = {"status": job.status, "error": job.error, "wall": time.perf_counter() - started,
+              "media_seconds": job.media_length, "cpu": time.process_time() - cpu_started, "peak_rss": None}
+    if resource:
+        after = (resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN))
+        result["cpu"] = sum(a.ru_utime + a.ru_stime - b.ru_utime - b.ru_stime for a, b in zip(after, before))
+        # ru_maxrss - кілобайти в Linux і байти в macOS; для дочірніх - найбільший з них
+        scale = 1 if sys.platform == "darwin" else 1024
+        result["peak_rss"] = max(usage.ru_maxrss for usage in after) * scale
+    print(json.dumps(result))
+
+def _measure(source, backend, trim, output_dir):
+    cmd = [sys.executable, "-m", "bench", "run-one", "--backend", backend, "--trim", str(trim), source, output_dir]
+    proc = subprocess.run(cmd, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        return {"status": "error", "error": proc.stderr.strip()[-200:]}
+    return json.loads(lines[-1])
+
+def bench_pipeline(args):
+    baseline = {}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    results = {}
+    regressions = []
+    print(f"{'джерело':<28} {'рушій':<8} {'обрізка':>7} {'час, с':>7} {'CPU, с':>7} {'RSS, МБ':>8} {'x реал.':>8} {'до бази':>8}")
+    with tempfile.TemporaryDirectory(prefix="vtm-bench-") as tmp_dir:
+        for seconds in args.durations:
+            for container, codec, rate, video in MEDIA_CASES:
+                name = f"{case_name(container, codec, rate, video)}-{seconds:g}s"
+                source = os.path.join(tmp_dir, f"{name}.{container}")
+                make_synthetic_media(source, seconds, rate, codec, video)
+                for backend in args.backends:
+                    for trim in args.trims:
+                        runs = [_measure(source, backend, trim, os.path.join(tmp_dir, "out")) for _ in range(args.repeat)]
+                        failed = [run for run in runs if run["status"] != "done"]
+                        if failed:
+                            print(f"{name:<28} {backend:<8} {trim:>7g}  ПОМИЛКА: {(failed[0]['error'] or '')[:100]}")
+                            continue
+                        # Медіана за часом, щоб один повільний прогін не псував порівняння
+                        run = sorted(runs, key=lambda r: r["wall"])[len(runs) // 2]
+                        run["realtime"] = run["media_seconds"] / run["wall"] if run["media_seconds"] else None
+                        key = f"{name}/{backend}/trim={trim:g}"
+                        results[key] = run
+                        delta = ""
+                        if key in baseline:
+                            change = (run["wall"] / baseline[key]["wall"] - 1) * 100
+                            delta = f"{change:+.0f}%"
+                            if args.fail_over is not None and change > args.fail_over:
+                                regressions.append(key)
+                        rss = f"{run['peak_rss'] / 1024 / 1024:.0f}" if run["peak_rss"] else "-"
+                        realtime = f"{run['realtime']:.1f}x" if run["realtime"] else "-"
+                        print(f"{name:<28} {backend:<8} {trim:>7g} {run['wall']:>7.2f} {run['cpu']:>7.2f} {rss:>8} {realtime:>8} {delta:>8}")
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Базу збережено: {args.save}")
+    if regressions:
+        print(f"Повільніше за базу більш ніж на {args.fail_over:g}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def copyfile(self, source, outputfile):
+        try: super().copyfile(source, outputfile)
+        except OSError: pass  # yt_dlp читає лише початок відповіді й закриває з'єднання
+
+    def log_message(self, format, *args):
+        pass
+
+def bench_scratch(args):
+    """Затримка короткого ролика по посиланню: джерело в пам'яті проти тимчасового файлу на диску."""
+    warm_up()
+    with tempfile.TemporaryDirectory(prefix="vtm-bench-") as tmp_dir:
+        media_dir = os.path.join(tmp_dir, "media")
+        os.makedirs(media_dir)
+        # Локальний HTTP-сервер замість сайту: мережа не впливає на порівняння
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_QuietHandler, directory=media_dir))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Тимчасові файли на диску: {JOBS_DIR}, повторів: {args.repeat}")
+        print(f"{'джерело':<16} {'МБ':>6} {'шлях':<7} {'завант., с':>10} {'кодув., с':>10} {'разом, с':>9}")
+        try:
+            for seconds in args.durations:
+                name = f"clip-{seconds:g}s.mp4"
+                make_synthetic_media(os.path.join(media_dir, name), seconds, 44100, "aac", True)
+                size = os.path.getsize(os.path.join(media_dir, name))
+                url = f"http://127.0.0.1:{server.server_address[1]}/{name}"
+                for limit in (0, max(DEFAULT_MEMORY_LIMIT, size)):
+                    runs = []
+                    for _ in range(args.repeat):
+                        started = time.perf_counter()
+                        job = run_jobs([JobSpec(url, os.path.join(tmp_dir, "out"), formats=args.formats)], lambda job: None,
+                                       memory_limit=limit)[0]
+                        if job.status != "done":
+                            print(f"{name:<16} ПОМИЛКА: {(job.error or '')[:100]}")
+                            break
+                        runs.append((time.perf_counter() - started, job.timings["download"], job.timings["encode"]["wall"]))
+                    if not runs:
+                        continue
+                    # Медіана за повним часом завдання
+                    total, download, encode = sorted(runs, key=lambda run: run[0])[len(runs) // 2]
+                    print(f"{name:<16} {size / 1024 / 1024:>6.1f} {download['scratch']:<7} {download['wall']:>10.3f} {encode:>10.3f} {total:>9.3f}")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+def _formats(value):
+    formats = [item for item in value.split(",") if item]
+    for item in formats:
+        parse_format(item)
+    return formats
+
+def _float_list(value):
+    return [float(item) for item in value.split(",") if item]
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Бенчмарки конвертації без мережі.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    segments = commands.add_parser("segments", help="прискорення сегментного кодування залежно від кількості ядер")
+    segments.add_argument("--minutes", type=float, default=30, help="тривалість синтетичного запису")
+    segments.add_argument("--max-workers", type=int, default=None, help="найбільша кількість сегментів (за замовчуванням - усі ядра)")
+    segments.set_defaults(func=bench_segments)
+
+    pipeline = commands.add_parser("pipeline", help="час, CPU, пам'ять і швидкість повної конвертації файлів за рушіями та обрізкою")
+    pipeline.add_argument("--durations", type=_float_list, default=[30, 120], metavar="S,S", help="тривалості синтетичних джерел у секундах")
+    pipeline.add_argument("--backends", type=lambda v: v.split(","), default=[b.name for b in BACKENDS], metavar="NAME,NAME", help="рушії: ffmpeg, moviepy")
+    pipeline.add_argument("--trims", type=_float_list, default=[0, 3], metavar="S,S", help="значення обрізки кінця")
+    pipeline.add_argument("--repeat", type=int, default=1, help="скільки разів повторювати кожен замір (береться медіана)")
+    pipeline.add_argument("--save", metavar="JSON", help="зберегти результати як базу для порівняння")
+    pipeline.add_argument("--compare", metavar="JSON", help="порівняти з раніше збереженою базою")
+    pipeline.add_argument("--fail-over", type=float, default=None, metavar="PCT", help="код виходу 1, якщо якийсь замір повільніший за базу більш ніж на PCT%%")
+    pipeline.set_defaults(func=bench_pipeline)
+
+    scratch = commands.add_parser("scratch", help="затримка коротких роликів по посиланню: буфер у пам'яті проти файлу на диску")
+    scratch.add_argument("--durations", type=_float_list, default=[15, 60], metavar="S,S", help="тривалості синтетичних роликів у секундах")
+    # Кілька форматів - щоб не спрацював потоковий шлях, який обходить обидва варіанти
+    scratch.add_argument("--formats", type=_formats, default=["mp3", "opus"], metavar="FMT,FMT", help="вихідні формати")
+    scratch.add_argument("--repeat", type=int, default=5, help="скільки разів повторювати кожен замір (береться медіана)")
+    scratch.set_defaults(func=bench_scratch)
+
+    one = commands.add_parser("run-one", help="один замір в окремому процесі (використовується pipeline)")
+    one.add_argument("--backend", required=True)
+    one.add_argument("--trim", type=float, default=0.0)
+    one.add_argument("source")
+    one.add_argument("output_dir")
+    one.set_defaults(func=run_one)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args) or 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""Кеш готових MP3 у SETTINGS_DIR: повторна конвертація того самого джерела - це просто копіювання файлу."""
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from engine import SETTINGS_DIR
+
+CACHE_DIR = os.path.join(SETTINGS_DIR, 'cache')
+DEFAULT_CACHE_LIMIT = 2 * 1024 * 1024 * 1024
+PARTIAL_HASH_BYTES = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+)
+"""
+
+def url_source_key(info):
+    """Ключ посилання: екстрактор + id відео, тож різні варіанти URL одного ролика збігаються."""
+    return f"url:{info.get('extractor_key') or info.get('extractor')}:{info['id']}"
+
+def file_source_key(path):
+    """Ключ файлу: розмір, час зміни та хеш початку й кінця - без читання всього файлу."""
+    stat = os.stat(path)
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        digest.update(f.read(PARTIAL_HASH_BYTES))
+        if stat.st_size > PARTIAL_HASH_BYTES:
+            f.seek(max(PARTIAL_HASH_BYTES, stat.st_size - PARTIAL_HASH_BYTES))
+            digest.update(f.read(PARTIAL_HASH_BYTES))
+    return f"file:{stat.st_size}:{stat.st_mtime_ns}:{digest.hexdigest()}"
+
+def cache_key(source_key, params):
+    """Об'єднує ключ джерела з параметрами обрізки та кодування."""
+    payload = json.dumps([source_key, params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ConversionCache:
+    """Кеш з обмеженням розміру: коли місце закінчується, видаляються найдавніше використані записи.
+
+    Індекс лежить у SQLite, тож GUI, CLI, стеження за папкою і сервер ділять його без втрати записів.
+    """
+    def __init__(self, directory=CACHE_DIR, max_bytes=DEFAULT_CACHE_LIMIT):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        # Одне з'єднання на всі робочі потоки, доступ - під self.lock
+        self.db = sqlite3.connect(os.path.join(directory, 'index.sqlite3'), timeout=30, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(SCHEMA)
+        self._adopt_orphans()
+
+    def _adopt_orphans(self):
+        """Файли без запису (старий index.json, збій між копіюванням і записом) теж рахуються в розмір і витісняються."""
+        with self.lock:
+            known = {key for key, in self.db.execute("SELECT key FROM entries")}
+        orphans = []
+        for entry in os.scandir(self.directory):
+            key, ext = os.path.splitext(entry.name)
+            if ext == '.mp3' and key not in known:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                orphans.append((key, stat.st_size, stat.st_mtime))
+        if orphans:
+            with self.lock, self.db:
+                self.db.executemany("INSERT OR IGNORE INTO entries (key, size, last_used) VALUES (?, ?, ?)", orphans)
+                self._evict()
+
+    def key_for_url(self, info, params):
+        return cache_key(url_source_key(info), params)
+
+    def key_for_file(self, path, params):
+        return cache_key(file_source_key(path), params)
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def get(self, key, dest_path):
+        """Копіює закешований MP3 у dest_path; повертає False, якщо запису немає або файл уже не прочитати."""
+        with self.lock, self.db:
+            if not self.db.execute("UPDATE entries SET last_used=? WHERE key=?", (time.time(), key)).rowcount:
+                return False
+        try:
+            # Інший процес міг саме витіснити файл: тоді запис застарів і джерело конвертується заново
+            shutil.copyfile(self._entry_path(key), dest_path)
+        except OSError:
+            with self.lock, self.db:
+                self.db.execute("DELETE FROM entries WHERE key=?", (key,))
+            return False
+        return True
+
+    def put(self, key, src_path):
+        """Додає готовий файл до кешу і за потреби звільняє місце."""
+        size = os.path.getsize(src_path)
+        if size > self.max_bytes:
+            return
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.copyfile(src_path, tmp_path)
+        os.replace(tmp_path, path)
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO entries (key, size, last_used) VALUES (?, ?, ?)",
+                            (key, size, time.time()))
+            self._evict()
+
+    def _evict(self):
+        """Викликається під self.lock усередині транзакції."""
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.db.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            try: os.remove(self._entry_path(key))
+            except FileNotFoundError: pass
+            except OSError: continue  # на Windows файл, який саме копіюють, не видалити - спробуємо наступного разу
+            self.db.execute("DELETE FROM entries WHERE key=?", (key,))
+            total -= size
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,177 @@
+"""Консольний запуск конвертації без вікна: python -m cli [посилання або файли...]"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from dataclasses import replace
+
+from cache import ConversionCache, DEFAULT_CACHE_LIMIT
+from engine import (DEFAULT_DOWNLOAD_WORKERS, DEFAULT_FORMATS, DEFAULT_FRAGMENT_WORKERS, DEFAULT_HOST_LIMIT, DEFAULT_LOUDNESS,
+                    DEFAULT_MEMORY_LIMIT, Job, JobQueue, JobSpec, report_fields, run_jobs)
+from jobstore import DB_PATH, JobStore
+from metrics import LOG_PATH, JobMetrics, serve_metrics
+from server import DEFAULT_MAX_PENDING, JobServer
+from watcher import STABLE_SECONDS, FolderWatcher, mirrored_output_dir
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Конвертація відео та посилань у MP3 без графічного інтерфейсу.")
+    parser.add_argument("inputs", nargs="*", help="посилання (TikTok, YouTube, плейлисти, RSS, ...) або шляхи до відеофайлів")
+    parser.add_argument("-o", "--output-dir", default=os.getcwd(), help="папка для MP3 (за замовчуванням - поточна)")
+    parser.add_argument("--trim", type=float, default=0.0, metavar="SEC", help="обрізати стільки секунд з кінця")
+    parser.add_argument("--trim-silence", action="store_true", help="замість --trim обрізати знайдену тишу в кінці")
+    parser.add_argument("--trim-leading", action="store_true", help="разом з --trim-silence обрізати тишу й на початку")
+    parser.add_argument("--loudness", type=float, nargs="?", const=DEFAULT_LOUDNESS, default=None, metavar="LUFS", help=f"вирівняти гучність за EBU R128 до LUFS (без значення - {DEFAULT_LOUDNESS:g})")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, metavar="N", help="скільки конвертацій виконувати одночасно")
+    parser.add_argument("--download-jobs", type=int, default=DEFAULT_DOWNLOAD_WORKERS, metavar="N", help="скільки завантажень виконувати одночасно")
+    parser.add_argument("--per-host", type=int, default=DEFAULT_HOST_LIMIT, metavar="N", help="скільки завантажень з одного сайту виконувати одночасно")
+    parser.add_argument("--fragments", type=int, default=DEFAULT_FRAGMENT_WORKERS, metavar="N", help="скільки фрагментів HLS/DASH завантажувати паралельно")
+    parser.add_argument("-f", "--format", action="append", dest="formats", metavar="FMT[:BITRATE]", help="вихідний формат: mp3, m4a, opus, wav; можна кілька разів (напр. -f mp3 -f opus:96k)")
+    parser.add_argument("--segments", type=int, default=None, metavar="N", help="на скільки паралельних сегментів ділити довгі записи (типово ядра порівну між поточними конвертаціями, 1 - вимкнути)")
+    parser.add_argument("--no-cache", action="store_true", help="не використовувати кеш готових MP3")
+    parser.add_argument("--cache-limit", type=int, default=DEFAULT_CACHE_LIMIT // (1024 * 1024), metavar="MB", help="максимальний розмір кешу")
+    parser.add_argument("--memory-limit", type=int, default=DEFAULT_MEMORY_LIMIT // (1024 * 1024), metavar="MB", help="менші джерела качати в пам'ять, а не на диск (0 - завжди на диск)")
+    parser.add_argument("--metrics-port", type=int, default=None, metavar="PORT", help="віддавати метрики Prometheus на http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--no-log", action="store_true", help=f"не писати підсумки завдань у {LOG_PATH}")
+    parser.add_argument("--watch", metavar="DIR", help="стежити за папкою й конвертувати кожне нове чи змінене відео (до Ctrl+C)")
+    parser.add_argument("--stable", type=float, default=STABLE_SECONDS, metavar="SEC", help="скільки секунд файл має не змінюватись, перш ніж його конвертувати")
+    parser.add_argument("--serve", type=int, default=None, metavar="PORT", help="запустити HTTP API черги на http://127.0.0.1:PORT (до Ctrl+C)")
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING, metavar="N", help="з --serve: скільки незавершених завдань приймати, далі - 503")
+    parser.add_argument("--resume", action="store_true", help="спершу продовжити завдання, не завершені минулого разу")
+    parser.add_argument("--history", nargs="?", const="", metavar="QUERY", help="вивести історію конвертацій (з пошуком за назвою чи джерелом) і вийти")
+    parser.add_argument("--no-history", action="store_true", help=f"не вести журнал завдань {DB_PATH} і не пропускати повтори")
+    return parser
+
+class JsonLinesReporter:
+    """Пише кожну зміну стану завдання окремим рядком JSON у stdout."""
+    def __init__(self, stream=sys.stdout):
+        self.stream = stream
+        self.lock = threading.Lock()
+        self.started = {}
+
+    def __call__(self, job):
+        now = time.monotonic()
+        started = self.started.setdefault(job.id, now)
+        event = {
+            "job": job.id,
+            "source": job.spec.source,
+            "status": job.status,
+            "progress": round(job.progress, 1),
+            "elapsed": round(now - started, 3),
+        }
+        if job.status == "done":
+            event["output"] = job.out_path
+            event["outputs"] = job.outputs
+            event["cached"] = job.cached
+            if job.skipped:
+                event["skipped"] = True
+            if job.loudness:
+                event["loudness"] = job.loudness
+            if job.report:
+                event["report"] = report_fields(job)
+            if job.children:
+                event["entries"] = len(job.children)
+            event["timings"] = {stage: {k: round(v, 3) if isinstance(v, float) else v for k, v in timing.items() if v is not None}
+                                for stage, timing in job.timings.items()}
+        elif job.status == "error":
+            event["error"] = job.error
+        elif job.speed:
+            event["speed"] = round(job.speed, 2)
+        if job.eta is not None:
+            event["eta"] = round(job.eta, 1)
+        with self.lock:
+            self.stream.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self.stream.flush()
+
+def print_history(store, query):
+    for row in store.history(query):
+        row["created"] = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(row["created"]))
+        print(json.dumps(row, ensure_ascii=False))
+    return 0
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    store = None if args.no_history else JobStore()
+    if args.history is not None:
+        if store is None:
+            parser.error("--history не працює разом з --no-history")
+        return print_history(store, args.history)
+    if not args.inputs and not args.resume and not args.watch and args.serve is None:
+        parser.error("потрібне хоча б одне посилання чи файл (або --resume, --watch, --serve)")
+    if args.watch and not os.path.isdir(args.watch):
+        parser.error(f"немає такої папки: {args.watch}")
+    os.makedirs(args.output_dir, exist_ok=True)
+    formats = args.formats or DEFAULT_FORMATS
+
+    def make_spec(source):
+        return JobSpec(source, args.output_dir, args.trim, segment_workers=args.segments, formats=formats,
+                       trim_mode="silence" if args.trim_silence else "fixed", trim_leading=args.trim_leading,
+                       loudness=args.loudness)
+    try:
+        specs = [make_spec(source) for source in args.inputs]
+        make_spec("")  # формати перевіряються й тоді, коли джерел немає
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    cache = None if args.no_cache else ConversionCache(max_bytes=args.cache_limit * 1024 * 1024)
+    metrics = JobMetrics(log_path=None if args.no_log else LOG_PATH)
+    if args.metrics_port:
+        serve_metrics(metrics, args.metrics_port)
+    limits = dict(download_workers=max(1, args.download_jobs), encode_workers=max(1, args.jobs),
+                  host_limit=max(1, args.per_host), fragment_workers=max(1, args.fragments),
+                  memory_limit=max(0, args.memory_limit) * 1024 * 1024)
+    if args.serve is not None:
+        return serve_api(args, specs, limits, cache, metrics, store)
+    if args.watch:
+        return watch_folder(args, specs, make_spec, limits, cache, metrics, store)
+    try:
+        jobs = run_jobs(specs, JsonLinesReporter(), cache=cache, metrics=metrics, store=store, resume=args.resume, **limits)
+    except KeyboardInterrupt:
+        return 130
+    return 0 if all(job.status == "done" for job in jobs) else 1
+
+def serve_api(args, specs, limits, cache, metrics, store):
+    """HTTP API на localhost; файли з командного рядка і --resume стають першими завданнями черги."""
+    server = JobServer(args.output_dir, cache=cache, metrics=metrics, store=store, max_pending=max(1, args.max_pending), **limits)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        for job in (store.pending() if store and args.resume else []) + [Job(spec) for spec in specs]:
+            server.queue.submit(job)
+        print(f"HTTP API: http://127.0.0.1:{args.serve}/jobs", file=sys.stderr)
+        asyncio.run(server.run("127.0.0.1", args.serve))
+    except KeyboardInterrupt: pass
+    finally:
+        server.shutdown()
+    return 0
+
+def watch_folder(args, specs, make_spec, limits, cache, metrics, store):
+    """Режим служби: черга живе, доки її не зупинять Ctrl+C або SIGTERM; незавершене продовжиться з --resume."""
+    queue = JobQueue(on_update=JsonLinesReporter(), cache=cache, metrics=metrics, store=store, **limits)
+
+    def submit(path, previous):
+        job = Job(replace(make_spec(path), output_dir=mirrored_output_dir(args.watch, path, args.output_dir),
+                          replaces=previous))
+        queue.submit(job)
+        return job
+    watcher = FolderWatcher(args.watch, submit, store, ignore=[args.output_dir], stable_seconds=args.stable)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        for job in (store.pending() if store and args.resume else []) + [Job(spec) for spec in specs]:
+            queue.submit(job)
+        watcher.start()
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        watcher.stop()
+        queue.interrupt()
+        queue.wait(timeout=5)
+    finally:
+        queue.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
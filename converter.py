@@ -1,15 +1,24 @@
+import time
+STARTED = time.perf_counter() # Для --startup-profile: відлік від початку імпортів
+
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-from moviepy import VideoFileClip
 import os
 import threading
 import json
-import yt_dlp
-from proglog import ProgressBarLogger
-import urllib.request
 import subprocess
 import sys
-import shutil
+from dataclasses import replace
+
+# yt_dlp, moviepy та urllib.request тут не імпортуються: engine вантажить їх ліниво,
+# а warm_up підтягує їх у фоні вже після появи вікна
+from engine import (SETTINGS_DIR, DEFAULT_DOWNLOAD_WORKERS, DEFAULT_ENCODE_WORKERS, DEFAULT_FORMATS, DEFAULT_HOST_LIMIT, DEFAULT_LOUDNESS,
+                    DEFAULT_MEMORY_LIMIT, HEAVY_MODULES, LOUDNESS_RANGE, OUTPUT_FORMATS, VIDEO_EXTENSIONS, Job, JobSpec, JobQueue, ProgressBus, warm_up)
+from cache import ConversionCache, DEFAULT_CACHE_LIMIT
+from jobstore import JobStore
+from metrics import JobMetrics, serve_metrics
+from watcher import FolderWatcher, mirrored_output_dir
+IMPORTED = time.perf_counter()
 
 
 THEMES = {
@@ -40,36 +49,50 @@ def get_color(key):
     return THEMES[CURRENT_THEME][key]
 
 # Шлях до файлу конфігурації
-SETTINGS_DIR = os.path.join(os.getenv('APPDATA'), 'VideoToMP3Converter')
 SETTINGS_FILE = os.path.join(SETTINGS_DIR, 'settings.json')
 
+URL_PLACEHOLDER = "Вставте посилання тут..."
+
 # --- ОНОВЛЕННЯ ---
 VERSION = "1.1.0"
 UPDATE_URL = "https://raw.githubusercontent.com/valick18/VideoToMp3/main/version.json"
 
-class MyBarLogger(ProgressBarLogger):
-    def __init__(self, progress_callback):
-        super().__init__()
-        self.progress_callback = progress_callback
+# UI забирає прогрес з ProgressBus 20 разів на секунду
+PROGRESS_POLL_MS = 50
+
+STATUS_LABELS = {
+    "queued": "У черзі",
+    "downloading": "Завантаження",
+    "waiting": "Чекає на конвертацію",
+    "streaming": "Завантаження + конвертація",
+    "expanding": "Розбір списку",
+    "analyzing": "Пошук тиші",
+    "encoding": "Конвертація",
+    "done": "Готово",
+    "error": "Помилка",
+    "cancelled": "Скасовано",
+}
 
-    def bars_callback(self, bar, attr, value, old_value=None):
-        if bar == 't':
-            try:
-                total = self.bars[bar]['total']
-                if total and total > 0:
-                    percentage = (value / total) * 100
-                    # Викликаємо з ігноруванням зайвих аргументів
-                    self.progress_callback(percentage)
-            except:
-                pass
 
 class ConverterApp:
     def __init__(self, root):
         self.root = root
         self.root.title("TikTok & Video to MP3 Converter")
-        self.root.geometry("600x670")
+        # Влазить в екран 768 px; додаткові налаштування згорнуті, список завдань прокручується
+        self.root.geometry("600x690")
+        self.root.minsize(560, 560)
         
-        self.video_path = ""
+        self.video_paths = []
+        self.jobs = [] # Усі завдання поточної сесії
+        self.job_rows = {} # job.id -> віджети рядка статусу
+        self.queue = None
+        self.watcher = None
+        self.progress_bus = ProgressBus()
+        self.metrics = JobMetrics()
+        try: self.store = JobStore()
+        except Exception as e:
+            print(f"Job history unavailable: {e}")
+            self.store = None
         self.auto_trim = tk.BooleanVar(value=False) # Вимкнено за замовчуванням
         self.last_source = None # "tiktok" або "file"
         self.mode = "link" # "link" або "file"
@@ -77,9 +100,24 @@ class ConverterApp:
         
         self.load_settings()
         self.setup_ui()
+        if self.metrics_port:
+            # Ендпоінт лише для localhost; порт задається в settings.json
+            try: serve_metrics(self.metrics, self.metrics_port)
+            except OSError as e: print(f"Metrics endpoint failed: {e}")
+        self.root.after(PROGRESS_POLL_MS, self._poll_progress)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
-        # Перевірка оновлень після запуску UI
-        self.root.after(1000, self.check_for_updates)
+        # Після першого кадру прогріваємо важкі модулі, а вже потім перевіряємо оновлення
+        self.root.after(100, self.start_warm_up)
+        self.root.after(150, self.resume_jobs)
+        self.root.after(200, self.start_watch)
+
+    def start_warm_up(self):
+        def _warm():
+            self.warm_up_timings = warm_up()
+            self.check_for_updates()
+        self.warm_up_timings = None
+        threading.Thread(target=_warm, daemon=True).start()
 
     def setup_ui(self):
         self.theme_colors = THEMES[self.theme]
@@ -112,6 +150,8 @@ class ConverterApp:
         self.btn_theme.pack(side="left", padx=5)
 
         help_fg = self.theme_colors["text_main"] if self.theme == "dark" else self.theme_colors["accent"]
+        self.btn_history = tk.Button(header_btns, text="🕘", command=self.show_history, bg=self.theme_colors["bg_surface"], fg=help_fg, font=("Segoe UI", 14), relief="flat", width=3, height=1, cursor="hand2", activebackground=self.theme_colors["btn_active"])
+        self.btn_history.pack(side="left", padx=(0, 5))
         self.btn_help = tk.Button(header_btns, text="?", command=self.show_help, bg=self.theme_colors["bg_surface"], fg=help_fg, font=("Segoe UI", 14, "bold"), relief="flat", width=3, height=1, cursor="hand2", activebackground=self.theme_colors["btn_active"])
         self.btn_help.pack(side="left")
 
@@ -138,8 +178,8 @@ class ConverterApp:
         self.btn_mode_file.pack(side="left", expand=True, fill="x", padx=(5, 0))
 
         # TikTok Section
-        self.tk_frame = tk.Frame(self.main_container, bg=self.theme_colors["bg_surface"], padx=20, pady=20)
-        self.tk_frame.pack(fill="x", pady=(0, 20))
+        self.tk_frame = tk.Frame(self.main_container, bg=self.theme_colors["bg_surface"], padx=20, pady=15)
+        self.tk_frame.pack(fill="x", pady=(0, 15))
         
         tk_header = tk.Frame(self.tk_frame, bg=self.theme_colors["bg_surface"])
         tk_header.pack(fill="x", pady=(0, 10))
@@ -150,9 +190,6 @@ class ConverterApp:
         self.btn_clear = tk.Button(tk_header, text="✕ ОЧИСТИТИ", command=self.clear_url, bg=self.theme_colors["bg_surface"], fg="#ff4444", font=("Segoe UI", 8, "bold"), relief="flat", padx=5, cursor="hand2")
         # self.btn_clear.pack(side="right") # Ховається за замовчуванням
         
-        self.url_var = tk.StringVar(value="Вставте посилання тут...")
-        self.url_var.trace_add("write", lambda *args: self.on_url_change())
-        
         self.url_container = tk.Frame(self.tk_frame, bg=self.theme_colors["entry_bg"], borderwidth=1, highlightthickness=0)
         self.url_container.pack(fill="x", pady=(0, 10))
         self.url_container.config(highlightbackground=self.theme_colors["btn_bg"], highlightthickness=1)
@@ -161,22 +198,27 @@ class ConverterApp:
         self.btn_paste = tk.Button(self.url_container, text="📋", command=self.paste_url, bg=self.theme_colors["entry_bg"], fg=self.theme_colors["text_main"], font=("Segoe UI", 14), relief="flat", padx=10, cursor="hand2", activebackground=self.theme_colors["btn_active"])
         self.btn_paste.pack(side="right")
 
-        self.url_entry = tk.Entry(self.url_container, textvariable=self.url_var, font=("Segoe UI", 12), bg=self.theme_colors["entry_bg"], fg=self.theme_colors["text_main"], insertbackground=self.theme_colors["text_main"], borderwidth=0)
-        self.url_entry.pack(side="left", fill="x", expand=True, ipady=8, padx=(15, 0)) # Прибираємо padx справа
-        self.url_entry.bind("<FocusIn>", lambda e: self.url_entry.delete(0, tk.END) if "Вставте" in self.url_entry.get() else None)
+        # Кілька посилань - по одному в рядку
+        self.url_entry = tk.Text(self.url_container, height=3, font=("Segoe UI", 11), bg=self.theme_colors["entry_bg"], fg=self.theme_colors["text_main"], insertbackground=self.theme_colors["text_main"], borderwidth=0, wrap="none")
+        self.url_entry.pack(side="left", fill="x", expand=True, pady=8, padx=(15, 0)) # Прибираємо padx справа
+        self.url_entry.insert("1.0", self.url_text or URL_PLACEHOLDER)
+        self.url_entry.bind("<FocusIn>", lambda e: self.url_entry.delete("1.0", tk.END) if URL_PLACEHOLDER in self.get_url_text() else None)
+        self.url_entry.bind("<<Modified>>", self._on_url_modified)
 
         # Local File Section
         self.file_frame = tk.Frame(self.main_container, bg=self.theme_colors["bg_surface"], padx=20, pady=20)
-        self.file_frame.pack(fill="x", pady=(0, 20))
+        self.file_frame.pack(fill="x", pady=(0, 15))
         
-        self.btn_select = tk.Button(self.file_frame, text="📂 ВИБРАТИ ФАЙЛ НА ПК", command=self.select_video, bg=self.theme_colors["btn_bg"], fg=self.theme_colors["text_main"], font=("Segoe UI", 11, "bold"), relief="flat", pady=10, cursor="hand2")
+        self.btn_select = tk.Button(self.file_frame, text="📂 ВИБРАТИ ФАЙЛИ НА ПК", command=self.select_video, bg=self.theme_colors["btn_bg"], fg=self.theme_colors["text_main"], font=("Segoe UI", 11, "bold"), relief="flat", pady=10, cursor="hand2")
         self.btn_select.pack(fill="x")
-        self.label_file = tk.Label(self.file_frame, text="Файл не вибрано", bg=self.theme_colors["bg_surface"], fg=self.theme_colors["text_dim"], font=("Segoe UI", 9, "italic"))
+        self.label_file = tk.Label(self.file_frame, text=self._files_caption(), bg=self.theme_colors["bg_surface"], fg=self.theme_colors["text_dim"], font=("Segoe UI", 9, "italic"))
         self.label_file.pack(pady=(5, 0))
+        self.btn_watch = tk.Button(self.file_frame, text=self._watch_caption(), command=self.toggle_watch, bg=self.theme_colors["btn_bg"], fg=self.theme_colors["text_main"], font=("Segoe UI", 10, "bold"), relief="flat", pady=6, cursor="hand2")
+        self.btn_watch.pack(fill="x", pady=(10, 0))
 
         # Trim Settings
         self.trim_frame = tk.Frame(self.main_container, bg=self.theme_colors["bg_surface"], padx=20, pady=15)
-        self.trim_frame.pack(fill="x", pady=(0, 30))
+        self.trim_frame.pack(fill="x", pady=(0, 15))
         
         self.cb_trim = tk.Checkbutton(self.trim_frame, text="Авто-обрізка кінця аудіофайла:", variable=self.auto_trim, bg=self.theme_colors["bg_surface"], fg=self.theme_colors["text_main"], selectcolor="#000" if self.theme == "dark" else "#fff", activebackground=self.theme_colors["bg_surface"], activeforeground=self.theme_colors["accent"], font=("Segoe UI", 10), cursor="hand2")
         self.cb_trim.pack(side="left")
@@ -187,6 +229,41 @@ class ConverterApp:
         self.label_sec = tk.Label(self.trim_frame, text="сек.", bg=self.theme_colors["bg_surface"], fg=self.theme_colors["text_dim"], font=("Segoe UI", 10))
         self.label_sec.pack(side="left")
 
+        # Тиша, паралельність і формати - у згортуваному розділі
+        self.btn_options = tk.Button(self.main_container, text=self._options_caption(), command=self.toggle_options, bg=self.theme_colors["bg_main"], fg=self.theme_colors["text_dim"], font=("Segoe UI", 9, "bold"), relief="flat", anchor="w", cursor="hand2", activebackground=self.theme_colors["bg_main"])
+        self.btn_options.pack(fill="x", pady=(0, 10))
+        self.options_frame = tk.Frame(self.main_container, bg=self.theme_colors["bg_main"])
+        if self.show_options:
+            self.options_frame.pack(fill="x")
+
+        # Замість фіксованих секунд - обрізка знайденої тиші
+        self.silence_frame = tk.Frame(self.options_frame, bg=self.theme_colors["bg_surface"], padx=20, pady=10)
+        self.silence_frame.pack(fill="x", pady=(0, 15))
+        for text, var in (("Обрізати тишу в кінці (замість секунд)", self.trim_silence), ("і на початку", self.trim_leading)):
+            tk.Checkbutton(self.silence_frame, text=text, variable=var, command=self.save_settings, bg=self.theme_colors["bg_surface"], fg=self.theme_colors["text_main"], selectcolor="#000" if self.theme == "dark" else "#fff", activebackground=self.theme_colors["bg_surface"], activeforeground=self.theme_colors["accent"], font=("Segoe UI", 10), cursor="hand2").pack(side="left", padx=(0, 10))
+
+        # Паралельність черги
+        self.workers_frame = tk.Frame(self.options_frame, bg=self.theme_colors["bg_surface"], padx=20, pady=10)
+        self.workers_frame.pack(fill="x", pady=(0, 15))
+        tk.Label(self.workers_frame, text="Одночасно: завантажень", bg=self.theme_colors["bg_surface"], fg=self.theme_colors["text_dim"], font=("Segoe UI", 10)).pack(side="left")
+        self.spin_download = tk.Spinbox(self.workers_frame, from_=1, to=16, width=3, textvariable=self.download_workers, font=("Segoe UI", 10, "bold"), bg=self.theme_colors["entry_bg"], fg=self.theme_colors["accent"], buttonbackground=self.theme_colors["btn_bg"], borderwidth=0, justify="center", command=self.save_settings)
+        self.spin_download.pack(side="left", padx=(8, 15))
+        tk.Label(self.workers_frame, text="конвертацій", bg=self.theme_colors["bg_surface"], fg=self.theme_colors["text_dim"], font=("Segoe UI", 10)).pack(side="left")
+        self.spin_encode = tk.Spinbox(self.workers_frame, from_=1, to=max(16, os.cpu_count() or 1), width=3, textvariable=self.encode_workers, font=("Segoe UI", 10, "bold"), bg=self.theme_colors["entry_bg"], fg=self.theme_colors["accent"], buttonbackground=self.theme_colors["btn_bg"], borderwidth=0, justify="center", command=self.save_settings)
+        self.spin_encode.pack(side="left", padx=8)
+        tk.Label(self.workers_frame, text="з одного сайту", bg=self.theme_colors["bg_surface"], fg=self.theme_colors["text_dim"], font=("Segoe UI", 10)).pack(side="left", padx=(7, 0))
+        self.spin_host = tk.Spinbox(self.workers_frame, from_=1, to=16, width=3, textvariable=self.host_limit, font=("Segoe UI", 10, "bold"), bg=self.theme_colors["entry_bg"], fg=self.theme_colors["accent"], buttonbackground=self.theme_colors["btn_bg"], borderwidth=0, justify="center", command=self.save_settings)
+        self.spin_host.pack(side="left", padx=8)
+
+        # Вихідні формати: джерело декодується один раз для всіх вибраних
+        self.formats_frame = tk.Frame(self.options_frame, bg=self.theme_colors["bg_surface"], padx=20, pady=10)
+        self.formats_frame.pack(fill="x", pady=(0, 15))
+        tk.Label(self.formats_frame, text="Формати:", bg=self.theme_colors["bg_surface"], fg=self.theme_colors["text_dim"], font=("Segoe UI", 10)).pack(side="left")
+        for name in OUTPUT_FORMATS:
+            tk.Checkbutton(self.formats_frame, text=name.upper(), variable=self.format_vars[name], command=self.save_settings, bg=self.theme_colors["bg_surface"], fg=self.theme_colors["text_main"], selectcolor="#000" if self.theme == "dark" else "#fff", activebackground=self.theme_colors["bg_surface"], activeforeground=self.theme_colors["accent"], font=("Segoe UI", 10), cursor="hand2").pack(side="left", padx=(8, 0))
+        # Вирівнювання гучності за EBU R128; ціль змінюється в settings.json (loudness_target)
+        tk.Checkbutton(self.formats_frame, text=f"Гучність {self.loudness_target:g} LUFS", variable=self.loudness, command=self.save_settings, bg=self.theme_colors["bg_surface"], fg=self.theme_colors["text_main"], selectcolor="#000" if self.theme == "dark" else "#fff", activebackground=self.theme_colors["bg_surface"], activeforeground=self.theme_colors["accent"], font=("Segoe UI", 10), cursor="hand2").pack(side="right")
+
         # Convert Button
         self.btn_convert = tk.Button(self.main_container, text="🔥 КОНВЕРТУВАТИ В MP3", command=self.start_conversion, bg=self.theme_colors["accent"], fg="#000" if self.theme == "dark" else "#fff", font=("Segoe UI", 16, "bold"), relief="flat", pady=18, cursor="hand2", activebackground="#1ed760")
         self.btn_convert.pack(fill="x")
@@ -198,37 +275,81 @@ class ConverterApp:
         self.status_label = tk.Label(self.main_container, text="Готово до роботи", font=("Segoe UI", 9), bg=self.theme_colors["bg_main"], fg=self.theme_colors["text_dim"])
         self.status_label.pack()
 
+        # Рядки статусу завдань (з прокруткою)
+        self.jobs_canvas = tk.Canvas(self.main_container, height=80, bg=self.theme_colors["bg_main"], highlightthickness=0)
+        self.jobs_scroll = ttk.Scrollbar(self.main_container, orient="vertical", command=self.jobs_canvas.yview)
+        self.jobs_frame = tk.Frame(self.jobs_canvas, bg=self.theme_colors["bg_main"])
+        self.jobs_frame.bind("<Configure>", lambda e: self.jobs_canvas.configure(scrollregion=self.jobs_canvas.bbox("all")))
+        self.jobs_window = self.jobs_canvas.create_window((0, 0), window=self.jobs_frame, anchor="nw")
+        self.jobs_canvas.bind("<Configure>", lambda e: self.jobs_canvas.itemconfig(self.jobs_window, width=e.width))
+        self.jobs_canvas.configure(yscrollcommand=self.jobs_scroll.set)
+        self.jobs_scroll.pack(side="right", fill="y", pady=(10, 0))
+        self.jobs_canvas.pack(fill="both", expand=True, pady=(10, 0))
+
+        self.job_rows = {}
+        for job in self.jobs:
+            self._render_job(job)
+        if self.jobs:
+            self._update_summary()
+
         # Початковий стан режимів
         self.switch_mode("link")
 
     def switch_mode(self, mode):
         self.mode = mode
         if mode == "link":
-            self.tk_frame.pack(fill="x", pady=(0, 20), after=self.mode_frame)
+            self.tk_frame.pack(fill="x", pady=(0, 15), after=self.mode_frame)
             self.file_frame.pack_forget()
             self.btn_mode_link.config(bg=self.theme_colors["accent"], fg="#000")
             self.btn_mode_file.config(bg=self.theme_colors["btn_bg"], fg=self.theme_colors["text_main"])
         else:
-            self.file_frame.pack(fill="x", pady=(0, 20), after=self.mode_frame)
+            self.file_frame.pack(fill="x", pady=(0, 15), after=self.mode_frame)
             self.tk_frame.pack_forget()
             self.btn_mode_file.config(bg=self.theme_colors["accent"], fg="#000")
             self.btn_mode_link.config(bg=self.theme_colors["btn_bg"], fg=self.theme_colors["text_main"])
 
+    def _options_caption(self):
+        return ("▾" if self.show_options else "▸") + " НАЛАШТУВАННЯ: тиша, паралельність, формати"
+
+    def toggle_options(self):
+        self.show_options = not self.show_options
+        if self.show_options:
+            self.options_frame.pack(fill="x", after=self.btn_options)
+        else:
+            self.options_frame.pack_forget()
+        self.btn_options.config(text=self._options_caption())
+        self.save_settings()
+
     def toggle_theme(self):
         self.theme = "light" if self.theme == "dark" else "dark"
         self.save_settings()
+        self.url_text = self.get_url_text()
         # Повне оновлення UI
         for widget in self.root.winfo_children():
             widget.destroy()
         self.setup_ui()
         # Повертаємо посилання на папку та файл
         self.label_dir_path.config(text=self.output_dir)
-        if self.video_path:
-            self.label_file.config(text=os.path.basename(self.video_path), fg=self.theme_colors["accent"])
+        if self.video_paths:
+            self.label_file.config(fg=self.theme_colors["accent"])
 
     def load_settings(self):
         default_dir = os.path.join(os.path.expanduser("~"), "Desktop")
         self.output_dir = default_dir
+        self.url_text = ""
+        self.cache_limit = DEFAULT_CACHE_LIMIT
+        self.memory_limit = DEFAULT_MEMORY_LIMIT  # байт; менші джерела качаються в пам'ять
+        self.metrics_port = None
+        self.watch_dir = None
+        self.download_workers = tk.IntVar(value=DEFAULT_DOWNLOAD_WORKERS)
+        self.format_vars = {name: tk.BooleanVar(value=name in DEFAULT_FORMATS) for name in OUTPUT_FORMATS}
+        self.encode_workers = tk.IntVar(value=DEFAULT_ENCODE_WORKERS)
+        self.host_limit = tk.IntVar(value=DEFAULT_HOST_LIMIT)
+        self.trim_silence = tk.BooleanVar(value=False)
+        self.trim_leading = tk.BooleanVar(value=False)
+        self.loudness = tk.BooleanVar(value=False)
+        self.loudness_target = DEFAULT_LOUDNESS
+        self.show_options = False
         if os.path.exists(SETTINGS_FILE):
             try:
                 with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
@@ -237,13 +358,40 @@ class ConverterApp:
                     if saved_dir and os.path.exists(saved_dir):
                         self.output_dir = saved_dir
                     self.theme = settings.get('theme', 'dark')
+                    self.download_workers.set(settings.get('download_workers', DEFAULT_DOWNLOAD_WORKERS))
+                    self.encode_workers.set(settings.get('encode_workers', DEFAULT_ENCODE_WORKERS))
+                    self.host_limit.set(settings.get('host_limit', DEFAULT_HOST_LIMIT))
+                    self.cache_limit = settings.get('cache_limit', DEFAULT_CACHE_LIMIT)
+                    self.memory_limit = settings.get('memory_limit', DEFAULT_MEMORY_LIMIT)
+                    self.metrics_port = settings.get('metrics_port')
+                    self.watch_dir = settings.get('watch_dir')
+                    saved_formats = settings.get('formats', DEFAULT_FORMATS)
+                    for name, var in self.format_vars.items():
+                        var.set(name in saved_formats)
+                    self.trim_silence.set(settings.get('trim_silence', False))
+                    self.trim_leading.set(settings.get('trim_leading', False))
+                    self.loudness.set(settings.get('loudness', False))
+                    target = float(settings.get('loudness_target', DEFAULT_LOUDNESS))
+                    if LOUDNESS_RANGE[0] <= target <= LOUDNESS_RANGE[1]:
+                        self.loudness_target = target
+                    self.show_options = bool(settings.get('show_options', False))
             except: pass
 
     def save_settings(self):
         try:
             os.makedirs(SETTINGS_DIR, exist_ok=True)
             with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
-                json.dump({'output_dir': self.output_dir, 'theme': self.theme}, f, ensure_ascii=False, indent=4)
+                json.dump({'output_dir': self.output_dir, 'theme': self.theme,
+                           'download_workers': self._worker_limit(self.download_workers, DEFAULT_DOWNLOAD_WORKERS),
+                           'encode_workers': self._worker_limit(self.encode_workers, DEFAULT_ENCODE_WORKERS),
+                           'host_limit': self._worker_limit(self.host_limit, DEFAULT_HOST_LIMIT),
+                           'cache_limit': self.cache_limit, 'memory_limit': self.memory_limit,
+                           'metrics_port': self.metrics_port, 'watch_dir': self.watch_dir,
+                           'formats': self.selected_formats(),
+                           'trim_silence': self.trim_silence.get(), 'trim_leading': self.trim_leading.get(),
+                           'loudness': self.loudness.get(), 'loudness_target': self.loudness_target,
+                           'show_options': self.show_options},
+                          f, ensure_ascii=False, indent=4)
         except: pass
 
     def select_directory(self):
@@ -253,28 +401,54 @@ class ConverterApp:
             self.label_dir_path.config(text=directory)
             self.save_settings()
 
+    def _worker_limit(self, var, default):
+        try: return max(1, int(var.get()))
+        except: return default
+
+    def selected_formats(self):
+        return [name for name, var in self.format_vars.items() if var.get()] or list(DEFAULT_FORMATS)
+
+    def _files_caption(self):
+        if not self.video_paths:
+            return "Файл не вибрано"
+        if len(self.video_paths) == 1:
+            return os.path.basename(self.video_paths[0])
+        return f"Вибрано файлів: {len(self.video_paths)}"
+
     def select_video(self):
-        path = filedialog.askopenfilename(filetypes=[("Відео", "*.mp4 *.avi *.mkv *.mov *.flv *.webm")])
-        if path:
-            self.video_path = path
+        paths = filedialog.askopenfilenames(filetypes=[("Відео", " ".join("*" + ext for ext in VIDEO_EXTENSIONS))])
+        if paths:
+            self.video_paths = list(paths)
             self.last_source = "file"
-            self.label_file.config(text=os.path.basename(path), fg=self.theme_colors["accent"])
+            self.label_file.config(text=self._files_caption(), fg=self.theme_colors["accent"])
             # Якщо є посилання, натякаємо що зараз пріоритет у файлу
-            if self.url_var.get() and "Вставте" not in self.url_var.get():
+            if self.get_urls():
                 self.status_label.config(text="Пріоритет: Локальний файл", fg=self.theme_colors["accent"])
 
+    def get_url_text(self):
+        return self.url_entry.get("1.0", tk.END).strip()
+
+    def get_urls(self):
+        text = self.get_url_text()
+        if URL_PLACEHOLDER in text:
+            return []
+        return [line.strip() for line in text.splitlines() if line.strip()]
+
     def clear_url(self):
-        self.url_var.set("")
+        self.url_entry.delete("1.0", tk.END)
         if self.last_source == "tiktok":
-            self.last_source = "file" if self.video_path else None
+            self.last_source = "file" if self.video_paths else None
         self.status_label.config(text="Посилання видалено", fg=self.theme_colors["text_dim"])
         self.btn_clear.pack_forget() # Ховаємо кнопку після очищення
 
+    def _on_url_modified(self, event=None):
+        self.url_entry.edit_modified(False)
+        self.on_url_change()
+
     def on_url_change(self):
-        val = self.url_var.get().strip()
-        if val and "Вставте" not in val and val != "":
+        if self.get_urls():
             self.last_source = "tiktok"
-            if self.video_path:
+            if self.video_paths:
                 self.status_label.config(text="Пріоритет: TikTok посилання", fg=self.theme_colors["accent"])
             # Показуємо кнопку очищення
             self.btn_clear.pack(side="right")
@@ -286,102 +460,231 @@ class ConverterApp:
         try:
             cb = self.root.clipboard_get()
             if "http" in cb:
-                self.url_var.set(cb)
+                # Нове посилання додаємо окремим рядком до вже вставлених
+                urls = self.get_urls()
+                self.url_entry.delete("1.0", tk.END)
+                self.url_entry.insert("1.0", "\n".join(urls + [cb.strip()]))
                 self.last_source = "tiktok"
         except: pass
 
     def start_conversion(self):
-        url = self.url_var.get().strip()
-        is_tiktok_url = url.startswith("http")
-        
         # Визначаємо пріоритет на основі обраного режиму
-        use_tiktok = False
         if self.mode == "link":
-            if not is_tiktok_url or "Вставте" in url:
-                messagebox.showwarning("Помилка", "Вставте коректне посилання!")
+            urls = self.get_urls()
+            if not urls or not all(u.startswith("http") for u in urls):
+                messagebox.showwarning("Помилка", "Вставте коректні посилання (по одному в рядку)!")
                 return
-            use_tiktok = True
+            sources = [(u, True) for u in urls]
         else:
-            if not self.video_path:
-                messagebox.showwarning("Помилка", "Виберіть файл на комп'ютері!")
+            if not self.video_paths:
+                messagebox.showwarning("Помилка", "Виберіть файли на комп'ютері!")
                 return
-            use_tiktok = False
-            
-        self.btn_convert.config(state="disabled", bg="#333")
-        self.status_label.config(text="Запуск процесу...", fg=self.theme_colors["accent"])
-        self.progress_bar["value"] = 0
-        
-        threading.Thread(target=self._process_logic, args=(use_tiktok, url), daemon=True).start()
+            sources = [(p, False) for p in self.video_paths]
+
+        self._ensure_queue()
+        for source, is_url in sources:
+            job = Job(self._make_spec(source, is_url))
+            self.jobs.append(job)
+            self._render_job(job)
+            self.queue.submit(job)
+        self._update_summary()
+
+    def _make_spec(self, source, is_url):
+        trim_val = 0.0
+        if self.auto_trim.get():
+            try: trim_val = float(self.trim_entry.get().replace(',', '.'))
+            except: trim_val = 3.0
+        return JobSpec(source, self.output_dir, trim_val, is_url, formats=self.selected_formats(),
+                       trim_mode="silence" if self.trim_silence.get() else "fixed",
+                       trim_leading=self.trim_leading.get(),
+                       loudness=self.loudness_target if self.loudness.get() else None)
+
+    def _watch_caption(self):
+        if self.watcher:
+            return f"⏹ ЗУПИНИТИ СТЕЖЕННЯ: {os.path.basename(self.watch_dir) or self.watch_dir}"
+        return "👁 СТЕЖИТИ ЗА ПАПКОЮ"
+
+    def toggle_watch(self):
+        if self.watcher:
+            self.watcher.stop()
+            self.watcher = None
+            self.watch_dir = None
+        else:
+            path = filedialog.askdirectory(title="Папка, куди падають нові відео")
+            if not path:
+                return
+            self.watch_dir = path
+            self.start_watch()
+        self.save_settings()
+        self.btn_watch.config(text=self._watch_caption())
 
-    def _process_logic(self, is_tiktok, url):
-        try:
-            target_video = self.video_path
-            
-            # Якщо TikTok - завантажуємо тимчасово
-            if is_tiktok:
-                self.root.after(0, self.status_label.config, {"text": "Завантаження з TikTok..."})
-                temp_video = os.path.join(SETTINGS_DIR, "tk_temp.mp4")
-                os.makedirs(SETTINGS_DIR, exist_ok=True)
-                
-                ydl_opts = {'format': 'best', 'outtmpl': temp_video, 'quiet': True, 'overwrites': True}
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(url, download=True)
-                    # Чистимо назву від символів
-                    safe_title = "".join(x for x in info.get('title', 'tiktok') if x.isalnum() or x in ' -_').strip()
-                target_video = temp_video
-                title = safe_title
-            else:
-                title = os.path.splitext(os.path.basename(self.video_path))[0]
-
-            out_path = os.path.join(self.output_dir, f"{title}.mp3")
-            
-            # Конвертація з обрізкою
-            logger = MyBarLogger(self._update_progress)
-            clip = VideoFileClip(target_video)
-            
-            trim_val = 0.0
-            if self.auto_trim.get():
-                try: trim_val = float(self.trim_entry.get().replace(',', '.'))
-                except: trim_val = 3.0
-            
-            final_end = clip.duration
-            if self.auto_trim.get():
-                final_end = max(0, clip.duration - trim_val)
-            
-            self.root.after(0, self.status_label.config, {"text": "Конвертація в MP3..."})
-            
-            # Сумісність з MoviePy 1.0 та 2.0
-            audio_track = clip.audio
-            if hasattr(audio_track, 'subclipped'):
-                processed_audio = audio_track.subclipped(0, final_end)
-            else:
-                processed_audio = audio_track.subclip(0, final_end)
-                
-            processed_audio.write_audiofile(out_path, logger=logger)
-            clip.close()
-            
-            if is_tiktok and os.path.exists(target_video):
-                try: os.remove(target_video)
-                except: pass
-                
-            self.root.after(0, self._finish, True, out_path)
-        except Exception as e:
-            msg = str(e)
-            self.root.after(0, self._finish, False, msg)
-
-    def _update_progress(self, val, *args, **kwargs):
-        # Використовуємо self.root.after для безпечного оновлення з іншого потоку
-        self.root.after(0, lambda: self.progress_bar.config(value=val))
-
-    def _finish(self, success, msg):
-        self.btn_convert.config(state="normal", bg=self.theme_colors["accent"])
-        if success:
-            file_name = os.path.basename(msg)
-            self.status_label.config(text=f"ЗБЕРЕЖЕНО: {file_name}", fg=self.theme_colors["accent"])
-            messagebox.showinfo("Успіх", f"Збережено:\n{msg}")
+    def start_watch(self):
+        """Нові відео з папки йдуть у чергу з поточними налаштуваннями; стеження переживає перезапуск."""
+        if self.watcher or not self.watch_dir or not os.path.isdir(self.watch_dir):
+            return
+        self._ensure_queue()
+        # Потік стеження не читає змінних Tk: параметри фіксуються зараз
+        template = self._make_spec(self.watch_dir, False)
+        root = self.watch_dir
+
+        def submit(path, previous):
+            # Підпапки станцій повторюються під папкою результату
+            job = Job(replace(template, source=path, output_dir=mirrored_output_dir(root, path, template.output_dir),
+                              replaces=previous))
+            self.queue.submit(job)  # рядок з'явиться в _poll_progress
+            return job
+        self.watcher = FolderWatcher(self.watch_dir, submit, self.store, ignore=[template.output_dir])
+        self.watcher.start()
+        self.btn_watch.config(text=self._watch_caption())
+
+    def _render_job(self, job):
+        row = self.job_rows.get(job.id)
+        if row is None:
+            frame = tk.Frame(self.jobs_frame, bg=self.theme_colors["bg_surface"], padx=10, pady=6)
+            frame.pack(fill="x", pady=(0, 4))
+            top = tk.Frame(frame, bg=self.theme_colors["bg_surface"])
+            top.pack(fill="x")
+            cancel = tk.Button(top, text="✕", command=lambda: self.cancel_job(job), bg=self.theme_colors["bg_surface"], fg=self.theme_colors["text_dim"], font=("Segoe UI", 8, "bold"), relief="flat", padx=4, pady=0, cursor="hand2", activebackground=self.theme_colors["btn_active"])
+            cancel.pack(side="right")
+            name = tk.Label(top, anchor="w", bg=self.theme_colors["bg_surface"], fg=self.theme_colors["text_main"], font=("Segoe UI", 9, "bold"))
+            name.pack(side="left", fill="x", expand=True)
+            bar = ttk.Progressbar(frame, style="Horizontal.TProgressbar", mode="determinate")
+            bar.pack(fill="x", pady=2)
+            status = tk.Label(frame, anchor="w", bg=self.theme_colors["bg_surface"], fg=self.theme_colors["text_dim"], font=("Segoe UI", 8))
+            status.pack(fill="x")
+            row = self.job_rows[job.id] = (name, bar, status, cancel)
+        name, bar, status, cancel = row
+        name.config(text=job.title[:70])
+        bar.config(value=job.progress)
+        text = STATUS_LABELS[job.status]
+        color = self.theme_colors["text_dim"]
+        if job.status == "done":
+            text = "ЗБЕРЕЖЕНО: " + ", ".join(os.path.basename(path) for path in job.outputs.values())
+            if job.children:
+                text = f"СПИСОК: додано {len(job.children)}"
+            elif job.skipped:
+                text += "  ·  вже є"
+            elif job.cached:
+                text += "  ·  з кешу"
+            elif job.report:
+                label, saved = job.report
+                text += f"  ·  формат {label}, зекономлено {saved / (1024 * 1024):.1f} МБ"
+            color = self.theme_colors["accent"]
+        elif job.status == "error":
+            text = f"ПОМИЛКА: {job.error}"[:200]
+            color = "#ff4444"
+        elif job.status == "cancelled":
+            text = "СКАСОВАНО"
+        elif job.status != "queued":
+            text += f"... {job.progress:.0f}%"
+            if job.speed:
+                text += f"  ·  {job.speed:.1f}x"
+            if job.eta is not None:
+                minutes, seconds = divmod(int(job.eta), 60)
+                text += f"  ·  ще {minutes}:{seconds:02d}"
+        status.config(text=text, fg=color)
+        if job.finished:
+            cancel.pack_forget()
+
+    def cancel_job(self, job):
+        if self.queue and not job.finished:
+            self.queue.cancel(job)
+
+    def _ensure_queue(self):
+        # Нові ліміти застосовуються, коли попередня черга вже порожня
+        limits = (self._worker_limit(self.download_workers, DEFAULT_DOWNLOAD_WORKERS),
+                  self._worker_limit(self.encode_workers, DEFAULT_ENCODE_WORKERS),
+                  self._worker_limit(self.host_limit, DEFAULT_HOST_LIMIT))
+        if self.queue is None or (self.queue.limits != limits and all(j.finished for j in self.jobs)):
+            if self.queue:
+                self.queue.shutdown()
+            self.queue = JobQueue(*limits[:2], on_update=self.progress_bus, host_limit=limits[2],
+                                  cache=ConversionCache(max_bytes=self.cache_limit), metrics=self.metrics, store=self.store,
+                                  memory_limit=self.memory_limit)
+
+    def resume_jobs(self):
+        """Продовжує завдання, які не завершились минулого разу (збій або закриття вікна)."""
+        if not self.store:
+            return
+        try: jobs = self.store.pending()
+        except Exception: return
+        if not jobs:
+            return
+        self._ensure_queue()
+        for job in jobs:
+            self.jobs.append(job)
+            self._render_job(job)
+            self.queue.submit(job)
+        self._update_summary()
+
+    def on_close(self):
+        """Зупиняє ffmpeg і завантаження; незавершені завдання продовжаться при наступному запуску."""
+        if self.watcher:
+            self.watcher.stop()
+        if self.queue:
+            self.queue.interrupt()
+            self.queue.wait(timeout=2)
+        self.root.destroy()
+
+    def _poll_progress(self):
+        """Малює лише найновіший стан кожного зміненого завдання, а підсумок - раз за тік."""
+        changed = self.progress_bus.drain()
+        for job in changed:
+            if job.id not in self.job_rows and job not in self.jobs:
+                self.jobs.append(job)  # елемент розгорнутого плейлиста
+            self._render_job(job)
+        if changed:
+            self._update_summary()
+        self.root.after(PROGRESS_POLL_MS, self._poll_progress)
+
+    def _update_overall(self):
+        active = [j for j in self.jobs if not j.finished]
+        if active:
+            self.progress_bar["value"] = sum(j.progress for j in active) / len(active)
+
+    def _update_summary(self):
+        done = sum(j.status == "done" for j in self.jobs)
+        failed = sum(j.status == "error" for j in self.jobs)
+        cancelled = sum(j.status == "cancelled" for j in self.jobs)
+        total = len(self.jobs)
+        if done + failed + cancelled < total:
+            self.status_label.config(text=f"Виконано {done + failed + cancelled} з {total}...", fg=self.theme_colors["accent"])
+            self._update_overall()
         else:
-            self.status_label.config(text="ПОМИЛКА ОБРОБКИ", fg="#ff4444")
-            messagebox.showerror("Помилка", msg)
+            self.progress_bar["value"] = 100
+            text = f"ГОТОВО: збережено {done}" + (f", помилок {failed}" if failed else "") + (f", скасовано {cancelled}" if cancelled else "")
+            self.status_label.config(text=text, fg="#ff4444" if failed else self.theme_colors["accent"])
+
+    def show_history(self):
+        if not self.store:
+            messagebox.showwarning("Історія", "Журнал завдань недоступний.")
+            return
+        window = tk.Toplevel(self.root)
+        window.title("Історія конвертацій")
+        window.geometry("560x500")
+        window.configure(bg=self.theme_colors["bg_surface"])
+        window.transient(self.root)
+
+        content = tk.Frame(window, bg=self.theme_colors["bg_surface"], padx=20, pady=20)
+        content.pack(fill="both", expand=True)
+        query = tk.StringVar()
+        search = tk.Entry(content, textvariable=query, font=("Segoe UI", 11), bg=self.theme_colors["entry_bg"], fg=self.theme_colors["text_main"], insertbackground=self.theme_colors["text_main"], relief="flat")
+        search.pack(fill="x", ipady=6, pady=(0, 10))
+        listbox = tk.Listbox(content, font=("Segoe UI", 9), bg=self.theme_colors["entry_bg"], fg=self.theme_colors["text_main"], selectbackground=self.theme_colors["accent"], relief="flat", borderwidth=0, activestyle="none")
+        listbox.pack(fill="both", expand=True)
+        labels = {"done": "✔", "error": "✖", "cancelled": "—"}
+
+        def refresh(*_):
+            listbox.delete(0, "end")
+            for row in self.store.history(query.get().strip()):
+                when = time.strftime("%d.%m %H:%M", time.localtime(row["created"]))
+                mark = labels.get(row["status"], "…")
+                listbox.insert("end", f"{when}  {mark}  {(row['title'] or row['source'])[:60]}")
+                if row["status"] == "error":
+                    listbox.itemconfig("end", fg="#ff4444")
+        query.trace_add("write", refresh)
+        refresh()
+        search.focus_set()
 
     def show_help(self):
         help_window = tk.Toplevel(self.root)
@@ -421,6 +724,7 @@ class ConverterApp:
         """Перевіряє наявність нової версії на сервері."""
         def _check():
             try:
+                import urllib.request
                 with urllib.request.urlopen(UPDATE_URL, timeout=5) as response:
                     data = json.loads(response.read().decode())
                     remote_version = data.get("version")
@@ -450,6 +754,7 @@ class ConverterApp:
                 temp_exe = os.path.join(SETTINGS_DIR, "converter_new.exe")
                 os.makedirs(SETTINGS_DIR, exist_ok=True)
                 
+                import urllib.request
                 urllib.request.urlretrieve(url, temp_exe)
                 self.root.after(0, self._apply_update, temp_exe)
             except Exception as e:
@@ -496,7 +801,36 @@ del "%~f0"
         except Exception as e:
             messagebox.showerror("Помилка", f"Не вдалося запустити процес оновлення: {e}")
 
+def run_startup_profile(root, app):
+    """Друкує час імпортів, час до першого кадру та тривалість фонового прогріву, і закриває вікно."""
+    report = {}
+
+    def on_first_frame(event):
+        if report:
+            return
+        report['first_frame'] = time.perf_counter() - STARTED
+        # Якщо важкий модуль уже завантажений до першого кадру - це регресія холодного старту
+        report['eager'] = [name for name in HEAVY_MODULES if name in sys.modules]
+        root.after(50, wait_warm_up)
+
+    def wait_warm_up():
+        if getattr(app, 'warm_up_timings', None) is None:
+            root.after(50, wait_warm_up)
+            return
+        print(f"Імпорт інтерфейсу та engine: {(IMPORTED - STARTED) * 1000:.0f} мс")
+        print(f"Перший кадр: {report['first_frame'] * 1000:.0f} мс")
+        if report['eager']:
+            print(f"Завантажені до першого кадру: {', '.join(report['eager'])}")
+        print("Фоновий прогрів:")
+        for name, seconds in app.warm_up_timings.items():
+            print(f"  {name:<16} {seconds * 1000:>6.0f} мс")
+        root.destroy()
+
+    root.bind("<Expose>", on_first_frame, add="+")
+
 if __name__ == "__main__":
     root = tk.Tk()
     app = ConverterApp(root)
+    if "--startup-profile" in sys.argv:
+        run_startup_profile(root, app)
     root.mainloop()
@@ -0,0 +1,1384 @@
+"""Конвертаційне ядро без Tkinter: завантаження, витягування аудіо та черга завдань."""
+import collections
+import importlib
+import itertools
+import math
+import os
+import queue
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from typing import List, NamedTuple, Optional, Protocol
+
+from mp3frames import DECODER_DELAY, ENCODER_DELAY, MPEG1_RATES, build_info_frame, split_frames
+
+# Папка налаштувань: %APPDATA% у Windows, ~/.config на інших системах
+SETTINGS_DIR = os.path.join(os.getenv('APPDATA') or os.path.join(os.path.expanduser("~"), ".config"), 'VideoToMP3Converter')
+
+# Важкі модулі імпортуються при першій конвертації або у фоні через warm_up,
+# щоб вікно з'являлося без очікування на них
+HEAVY_MODULES = ("urllib.request", "yt_dlp", "proglog", "moviepy")
+
+def warm_up():
+    """Імпортує важкі модулі заздалегідь і повертає {модуль: секунд на імпорт}."""
+    timings = {}
+    for name in HEAVY_MODULES:
+        started = time.perf_counter()
+        try: importlib.import_module(name)
+        except ImportError: continue
+        timings[name] = time.perf_counter() - started
+    return timings
+
+class JobCancelled(Exception):
+    """Завдання скасовано: колбек прогресу кидає її, а рушії зупиняють свої процеси ffmpeg."""
+
+# Завантажуємо лише аудіо: найкраща доріжка без відео,
+# а якщо такої немає - найменший формат з відео та звуком
+AUDIO_FORMAT = "bestaudio/worst"
+
+def _format_size(fmt):
+    return fmt.get('filesize') or fmt.get('filesize_approx') or 0
+
+def describe_download(info):
+    """Повертає опис вибраного формату та кількість зекономлених байтів."""
+    chosen_size = _format_size(info)
+    # Формати від yt_dlp відсортовані від гіршого до кращого,
+    # тож останній з відео та звуком - це те, що дав би 'best'
+    muxed = [f for f in info.get('formats') or []
+             if f.get('vcodec') not in (None, 'none') and f.get('acodec') not in (None, 'none')]
+    best_size = _format_size(muxed[-1]) if muxed else 0
+    saved = max(0, best_size - chosen_size) if chosen_size and best_size else 0
+    label = f"{info.get('format_id', '?')} ({info.get('ext', '?')}, {info.get('acodec') or '?'})"
+    return label, saved
+
+def report_fields(job):
+    """job.report для JSON (CLI, API, журнал метрик) або None, якщо формат не вибирався."""
+    if not job.report:
+        return None
+    label, saved = job.report
+    return {"source_format": label, "saved_bytes": saved}
+
+def is_audio_only(info):
+    return info.get('vcodec') in (None, 'none')
+
+def make_bar_logger(progress_callback):
+    """Логер прогресу MoviePy; proglog імпортується лише тут."""
+    from proglog import ProgressBarLogger
+
+    class MyBarLogger(ProgressBarLogger):
+        def __init__(self, progress_callback):
+            super().__init__()
+            self.progress_callback = progress_callback
+
+        def bars_callback(self, bar, attr, value, old_value=None):
+            if bar == 't':
+                try:
+                    total = self.bars[bar]['total']
+                    if total and total > 0:
+                        percentage = (value / total) * 100
+                        # Викликаємо з ігноруванням зайвих аргументів
+                        self.progress_callback(percentage)
+                except JobCancelled:
+                    raise  # MoviePy перерве запис файлу
+                except:
+                    pass
+
+    return MyBarLogger(progress_callback)
+
+# --- РУШІЇ КОНВЕРТАЦІЇ ---
+MP3_BITRATE = "128k"
+MP3_FRAME = 1152
+# Сегментне кодування вмикається для записів від 10 хвилин
+SEGMENT_MIN_DURATION = 10 * 60
+SEGMENT_LEAD_FRAMES = 8
+SEGMENT_TAIL_FRAMES = 2
+
+def get_ffmpeg_exe():
+    """Шукає ffmpeg: спочатку в PATH, потім той, що постачається разом з MoviePy."""
+    exe = shutil.which("ffmpeg")
+    if exe:
+        return exe
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+def _popen_flags():
+    # У зібраному .exe без консолі не показуємо чорні вікна ffmpeg
+    return subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+
+class MediaInfo(NamedTuple):
+    duration: Optional[float]
+    codec: str
+    rate: Optional[int]
+    channels: int
+    video: bool  # є відеодоріжка (обкладинка MP3 не рахується)
+
+def probe_media(path):
+    """Повертає тривалість, аудіокодек, частоту та кількість каналів, розбираючи вивід `ffmpeg -i`."""
+    result = subprocess.run([get_ffmpeg_exe(), "-hide_banner", "-i", path],
+                            capture_output=True, text=True, errors="replace", creationflags=_popen_flags())
+    duration = None
+    match = re.search(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)", result.stderr)
+    if match:
+        h, m, sec = match.groups()
+        duration = int(h) * 3600 + int(m) * 60 + float(sec)
+    match = re.search(r"Stream #\S+.*?: Audio: (\w+)(.*)", result.stderr)
+    if match is None:
+        raise RuntimeError("У файлі немає аудіодоріжки")
+    codec, details = match.groups()
+    rate = re.search(r"(\d+) Hz", details)
+    layout = re.search(r"Hz, ([^,]+)", details)
+    channels = 2
+    if layout:
+        layout = layout.group(1).strip()
+        channels = {"mono": 1, "stereo": 2}.get(layout, 0) or int((re.match(r"(\d+)", layout) or [0, 2])[1])
+    video = any(": Video:" in line and "(attached pic)" not in line for line in result.stderr.splitlines())
+    return MediaInfo(duration, codec, int(rate.group(1)) if rate else None, channels, video)
+
+class FfmpegBackend:
+    """Один процес ffmpeg: без відео, з обрізкою через -t та прогресом з -progress."""
+    name = "ffmpeg"
+
+    def available(self):
+        return get_ffmpeg_exe() is not None
+
+    def _command(self, source, codec, length, out_path, start=0.0):
+        cmd = [get_ffmpeg_exe(), "-hide_banner", "-nostdin", "-loglevel", "error", "-y"]
+        if source == "pipe:0":
+            # MP4 з moov у кінці з труби не читається, і без -xerror ffmpeg мовчки пише порожній файл
+            cmd += ["-xerror"]
+        if start > 0:
+            cmd += ["-ss", f"{start:.3f}"]
+        cmd += ["-i", source, "-vn", "-map", "0:a:0"]
+        if length is not None:
+            cmd += ["-t", f"{length:.3f}"]
+        # MP3 всередині контейнера просто копіюємо без перекодування
+        if codec == "mp3":
+            cmd += ["-c:a", "copy"]
+        else:
+            cmd += ["-c:a", "libmp3lame", "-b:a", MP3_BITRATE]
+        cmd += ["-f", "mp3", "-progress", "pipe:1", "-nostats", out_path]
+        return cmd
+
+    def _run(self, cmd, final_end, on_encoded, stdin=None):
+        proc = subprocess.Popen(cmd, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                creationflags=_popen_flags())
+        return proc, threading.Thread(target=self._read_progress, args=(proc, final_end, on_encoded), daemon=True)
+
+    def _read_progress(self, proc, final_end, on_encoded):
+        for raw in proc.stdout:
+            key, _, value = raw.decode(errors="replace").strip().partition("=")
+            # out_time_ms у ffmpeg насправді в мікросекундах
+            if key in ("out_time_us", "out_time_ms") and final_end:
+                try: seconds = int(value) / 1_000_000
+                except ValueError: continue
+                try:
+                    on_encoded(min(1.0, seconds / final_end))
+                except JobCancelled:
+                    # ffmpeg звітує двічі на секунду, тож скасування зупиняє його швидко
+                    proc.cancelled = True
+                    proc.kill()
+                    return
+
+    def _wait(self, proc, reader):
+        reader.join()
+        err = proc.stderr.read().decode(errors="replace")
+        if getattr(proc, "cancelled", False):
+            proc.wait()
+            raise JobCancelled()
+        if proc.wait() != 0:
+            raise RuntimeError(err.strip() or f"ffmpeg завершився з кодом {proc.returncode}")
+
+    def extract(self, source, out_path, trim_val, progress_callback, audio_only=False, segment_workers=None, start=0.0):
+        duration, codec, rate = probe_media(source)[:3]
+        final_end = max(0, duration - trim_val) if duration else None
+        length = max(0, final_end - start) if final_end is not None else None
+
+        # Довгі записи кодуємо сегментами на всіх ядрах
+        workers = (os.cpu_count() or 1) if segment_workers is None else segment_workers
+        if codec != "mp3" and length and length >= SEGMENT_MIN_DURATION and workers > 1:
+            try:
+                self.extract_segmented(source, out_path, length, rate, workers, progress_callback, start)
+                return
+            except JobCancelled:
+                raise
+            except Exception:
+                progress_callback(0)  # Кодуємо одним процесом
+
+        proc, reader = self._run(self._command(source, codec, length if trim_val > 0 else None, out_path, start),
+                                 length, lambda f: progress_callback(f * 100))
+        reader.start()
+        self._wait(proc, reader)
+        progress_callback(100.0)
+
+    def extract_segmented(self, source, out_path, length, rate, workers, progress_callback, offset=0.0):
+        """Ділить (offset, offset + length) на сегменти, кодує їх паралельно і склеює покадрово без пауз на стиках."""
+        # Межі сегментів кратні кадру MP3, тож сітка кадрів у всіх сегментах збігається з суцільним кодуванням
+        rate = rate if rate in MPEG1_RATES else 44100
+        total_samples = int(round(length * rate))
+        total_frames = -(-(total_samples + ENCODER_DELAY + DECODER_DELAY) // MP3_FRAME)
+        bounds = [total_frames * i // workers for i in range(workers)] + [total_frames]
+        encoded = [0.0] * workers
+
+        def on_encoded(index, seconds):
+            encoded[index] = seconds
+            progress_callback(min(100.0, sum(encoded) / length * 100))
+
+        with tempfile.TemporaryDirectory(prefix="vtm-segments-") as tmp_dir:
+            paths = [os.path.join(tmp_dir, f"{i}.mp3") for i in range(workers)]
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(self._encode_segment, source, paths[i], i, bounds, total_samples, rate, offset,
+                                       lambda f, i=i: on_encoded(i, f * (bounds[i + 1] - bounds[i]) * MP3_FRAME / rate))
+                           for i in range(workers)]
+                for future in futures:
+                    future.result()
+            self._join_segments(paths, bounds, out_path, total_samples)
+        progress_callback(100.0)
+
+    def _encode_segment(self, source, path, index, bounds, total_samples, rate, offset, on_encoded):
+        # Кожен сегмент, крім першого, починається на кілька кадрів раніше, щоб енкодер "розігрівся";
+        # ці кадри потім відкидаються. Без бітового резервуару кадри не залежать від попередніх.
+        lead = min(SEGMENT_LEAD_FRAMES, bounds[index])
+        start = (bounds[index] - lead) * MP3_FRAME
+        last = index == len(bounds) - 2
+        end = total_samples if last else min(total_samples, (bounds[index + 1] + SEGMENT_TAIL_FRAMES) * MP3_FRAME)
+        cmd = [get_ffmpeg_exe(), "-hide_banner", "-nostdin", "-loglevel", "error", "-y"]
+        if offset or start:
+            cmd += ["-ss", f"{offset + start / rate:.6f}"]
+        cmd += ["-i", source, "-vn", "-map", "0:a:0", "-t", f"{(end - start) / rate:.6f}", "-ar", str(rate),
+                "-c:a", "libmp3lame", "-b:a", MP3_BITRATE, "-reservoir", "0",
+                "-id3v2_version", "0", "-write_xing", "1" if index == 0 else "0",
+                "-f", "mp3", "-progress", "pipe:1", "-nostats", path]
+        duration = (end - start) / rate
+        proc, reader = self._run(cmd, duration, on_encoded)
+        reader.start()
+        self._wait(proc, reader)
+
+    def _join_segments(self, paths, bounds, out_path, total_samples):
+        info = None
+        selected = []
+        for index, path in enumerate(paths):
+            with open(path, 'rb') as f:
+                data = f.read()
+            seg_info, frames = split_frames(data)
+            if index == 0:
+                info = seg_info
+            lead = min(SEGMENT_LEAD_FRAMES, bounds[index])
+            count = len(frames) - lead if index == len(paths) - 1 else bounds[index + 1] - bounds[index]
+            if len(frames) < lead + count or count <= 0:
+                raise RuntimeError(f"Сегмент {index} закоротий: {len(frames)} кадрів")
+            selected.append(frames[lead:lead + count])
+        if info is None:
+            raise RuntimeError("Немає Info-кадру в першому сегменті")
+
+        lengths = [length for frames in selected for _, length in frames]
+        with open(out_path, 'wb') as out:
+            out.write(build_info_frame(info, lengths, total_samples, MP3_FRAME))
+            for path, frames in zip(paths, selected):
+                with open(path, 'rb') as f:
+                    data = f.read()
+                for pos, length in frames:
+                    out.write(data[pos:pos + length])
+
+    def extract_stream(self, chunks, total_size, codec, duration, out_path, trim_val, progress_callback):
+        """Кодує байти прямо під час завантаження: chunks подаються ffmpeg через stdin."""
+        final_end = max(0, duration - trim_val) if duration else None
+        state = {"downloaded": 0.0, "encoded": 0.0}
+
+        def report():
+            # Загальний прогрес: половина - завантаження, половина - кодування
+            encoded = state["encoded"] if final_end else state["downloaded"]
+            progress_callback((state["downloaded"] + encoded) * 50)
+
+        def on_encoded(fraction):
+            state["encoded"] = fraction
+            report()
+
+        proc, reader = self._run(self._command("pipe:0", codec, final_end if trim_val > 0 else None, out_path),
+                                 final_end, on_encoded, stdin=subprocess.PIPE)
+        reader.start()
+        feed_errors = []
+        received = 0
+        try:
+            for chunk in chunks:
+                try:
+                    proc.stdin.write(chunk)
+                except OSError:
+                    break  # ffmpeg вже отримав усе потрібне (-t) і закрив вхід
+                received += len(chunk)
+                if total_size:
+                    state["downloaded"] = min(1.0, received / total_size)
+                    report()
+        except Exception as e:
+            feed_errors.append(e)
+        finally:
+            try: proc.stdin.close()
+            except OSError: pass
+        # Обірване завантаження ffmpeg сприйняв би як кінець файлу
+        if feed_errors:
+            proc.kill()
+            reader.join()
+            proc.wait()
+            raise feed_errors[0]
+        self._wait(proc, reader)
+        progress_callback(100.0)
+
+class MoviePyBackend:
+    """Старий шлях через MoviePy - запасний варіант, якщо ffmpeg недоступний."""
+    name = "moviepy"
+
+    def available(self):
+        return True
+
+    def extract(self, source, out_path, trim_val, progress_callback, audio_only=False, segment_workers=None, start=0.0):
+        from moviepy import VideoFileClip, AudioFileClip
+        logger = make_bar_logger(progress_callback)
+        if not audio_only:
+            # Локальні файли приходять без цієї ознаки: VideoFileClip на M4A чи MP3 падає на першому кадрі
+            audio_only = not probe_media(source).video
+        # Для аудіо без відео не відкриваємо відеорідер взагалі
+        clip = AudioFileClip(source) if audio_only else VideoFileClip(source)
+        try:
+            final_end = max(0, clip.duration - trim_val)
+
+            # Сумісність з MoviePy 1.0 та 2.0
+            audio_track = clip if audio_only else clip.audio
+            if hasattr(audio_track, 'subclipped'):
+                processed_audio = audio_track.subclipped(start, final_end)
+            else:
+                processed_audio = audio_track.subclip(start, final_end)
+
+            processed_audio.write_audiofile(out_path, logger=logger)
+        finally:
+            clip.close()
+
+BACKENDS = [FfmpegBackend(), MoviePyBackend()]
+
+def extract_audio(source, out_path, trim_val, progress_callback, audio_only=False, segment_workers=None, start=0.0):
+    """Витягує аудіо від start до (тривалість - trim_val) першим робочим рушієм і повертає його назву."""
+    last_error = None
+    for backend in BACKENDS:
+        if not backend.available():
+            continue
+        try:
+            backend.extract(source, out_path, trim_val, progress_callback, audio_only, segment_workers, start)
+            return backend.name
+        except JobCancelled:
+            raise
+        except Exception as e:
+            last_error = e
+    raise last_error or RuntimeError("Не знайдено рушія для конвертації")
+
+# --- КІЛЬКА ФОРМАТІВ ЗА ОДИН ПРОХІД ---
+OUTPUT_FORMATS = {
+    "mp3": {"codec": "libmp3lame", "muxer": "mp3", "bitrate": MP3_BITRATE},
+    "m4a": {"codec": "aac", "muxer": "ipod", "bitrate": "160k"},
+    "opus": {"codec": "libopus", "muxer": "ogg", "bitrate": "96k", "rate": 48000},
+    "wav": {"codec": "pcm_s16le", "muxer": "wav", "bitrate": None},
+}
+DEFAULT_FORMATS = ["mp3"]
+PCM_CHUNK = 256 * 1024
+
+def parse_format(value):
+    """'opus:96k' -> ('opus', '96k'); без бітрейту береться типовий для формату."""
+    name, _, bitrate = value.lower().partition(":")
+    if name not in OUTPUT_FORMATS:
+        raise ValueError(f"Невідомий формат: {name}")
+    return name, bitrate or OUTPUT_FORMATS[name]["bitrate"]
+
+def output_paths(output_dir, title, formats):
+    return {name: os.path.join(output_dir, f"{title}.{name}") for name, _ in map(parse_format, formats)}
+
+def temp_output_path(path, job_id):
+    """Тимчасовий файл завдання поруч з результатом; розширення лишається в кінці, за ним MoviePy вибирає кодек."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{job_id}.part{ext}"
+
+def _wait_with_cpu(proc):
+    """Чекає завершення процесу; повертає його процесорний час там, де ОС це дозволяє (не Windows)."""
+    if not hasattr(os, "wait4"):
+        proc.wait()
+        return None
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return usage.ru_utime + usage.ru_stime
+
+class _PcmEncoder:
+    """Окремий процес ffmpeg, що кодує PCM зі свого stdin; дані подає власний потік через обмежену чергу."""
+    def __init__(self, name, bitrate, rate, channels, out_path, gain=0.0):
+        spec = OUTPUT_FORMATS[name]
+        cmd = [get_ffmpeg_exe(), "-hide_banner", "-nostdin", "-loglevel", "error", "-y",
+               "-f", "s16le", "-ar", str(rate), "-ac", str(channels), "-i", "pipe:0"]
+        if gain:
+            cmd += ["-af", f"volume={gain:.2f}dB"]  # підсилення після вимірювання гучності
+        cmd += ["-c:a", spec["codec"]]
+        if bitrate:
+            cmd += ["-b:a", bitrate]
+        if spec.get("rate") and spec["rate"] != rate:
+            cmd += ["-ar", str(spec["rate"])]
+        cmd += ["-f", spec["muxer"], out_path]
+        self.name = name
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                     stderr=subprocess.PIPE, creationflags=_popen_flags())
+        self.chunks = queue.Queue(maxsize=8)
+        self.error = None
+        self.started = time.perf_counter()
+        self.timing = {}
+        self.thread = threading.Thread(target=self._write, daemon=True)
+        self.thread.start()
+
+    def _write(self):
+        while True:
+            chunk = self.chunks.get()
+            if chunk is None:
+                break
+            if self.error:
+                continue  # Енкодер уже впав - просто спорожнюємо чергу
+            try:
+                self.proc.stdin.write(chunk)
+            except OSError as e:
+                self.error = e
+        try: self.proc.stdin.close()
+        except OSError: pass
+        err = self.proc.stderr.read().decode(errors="replace")
+        cpu = _wait_with_cpu(self.proc)
+        if self.proc.returncode != 0:
+            self.error = RuntimeError(f"{self.name}: {err.strip() or self.proc.returncode}")
+        self.timing = {"wall": time.perf_counter() - self.started, "cpu": cpu}
+
+    def finish(self):
+        self.chunks.put(None)
+        self.thread.join()
+        if self.error:
+            raise self.error
+
+def fan_out_extract(source, out_paths, formats, trim_val, progress_callback, start=0.0, loudness=None):
+    """Декодує джерело один раз і роздає PCM усім енкодерам одночасно.
+
+    Повертає {етап: {"wall": с, "cpu": с}} для декодування та кожного формату, тож видно,
+    скільки коштувало б повторне декодування в окремих завданнях.
+
+    З loudness (ціль у LUFS) декодований PCM спершу йде у вимірювач гучності та тимчасовий файл,
+    а енкодери отримують його з диска і самі застосовують підсилення: другого декодування немає.
+    """
+    media = probe_media(source)
+    rate = media.rate or 44100
+    channels = 1 if media.channels == 1 else 2
+    final_end = max(0, media.duration - trim_val) if media.duration else None
+    length = max(0, final_end - start) if final_end is not None else None
+
+    decode_cmd = [get_ffmpeg_exe(), "-hide_banner", "-nostdin", "-loglevel", "error"]
+    if start > 0:
+        decode_cmd += ["-ss", f"{start:.3f}"]
+    decode_cmd += ["-i", source, "-vn", "-map", "0:a:0"]
+    if length is not None and trim_val > 0:
+        decode_cmd += ["-t", f"{length:.3f}"]
+    decode_cmd += ["-f", "s16le", "-ar", str(rate), "-ac", str(channels), "pipe:1"]
+
+    def start_encoders(gain=0.0):
+        return [_PcmEncoder(name, bitrate, rate, channels, out_paths[name], gain)
+                for name, bitrate in map(parse_format, formats)]
+
+    measure = loudness is not None
+    spill = None
+    if measure:
+        from loudness import LoudnessMeter
+        meter = LoudnessMeter(rate, channels)
+        spill = tempfile.TemporaryFile(prefix="vtm-pcm-")
+        analysis = analysis_cpu = 0.0  # час вимірювання в Python: настінний і процесорний цього потоку
+    encoders = [] if measure else start_encoders()
+    decode_share = 50.0 if measure else 99.0  # з вимірюванням друга половина прогресу - кодування
+    started = time.perf_counter()
+    decoder = subprocess.Popen(decode_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, creationflags=_popen_flags())
+    total = length * rate * channels * 2 if length else None
+    received = 0
+    try:
+        try:
+            while True:
+                chunk = decoder.stdout.read(PCM_CHUNK)
+                if not chunk:
+                    break
+                if measure:
+                    tick, cpu_tick = time.perf_counter(), time.thread_time()
+                    meter.feed(chunk)
+                    analysis += time.perf_counter() - tick
+                    analysis_cpu += time.thread_time() - cpu_tick
+                    spill.write(chunk)
+                else:
+                    for encoder in encoders:
+                        encoder.chunks.put(chunk)
+                received += len(chunk)
+                if total:
+                    progress_callback(min(decode_share, received / total * decode_share))
+            err = decoder.stderr.read().decode(errors="replace")
+            cpu = _wait_with_cpu(decoder)
+            if decoder.returncode != 0:
+                raise RuntimeError(err.strip() or f"ffmpeg завершився з кодом {decoder.returncode}")
+            timings = {"decode": {"wall": time.perf_counter() - started, "cpu": cpu}}
+        finally:
+            if decoder.poll() is None:
+                decoder.kill()
+        if measure:
+            tick, cpu_tick = time.perf_counter(), time.thread_time()
+            result = meter.result()
+            analysis += time.perf_counter() - tick
+            analysis_cpu += time.thread_time() - cpu_tick
+            gain = result.gain_for(loudness)
+            encoders = start_encoders(gain)
+            spill.seek(0)
+            sent = 0
+            while True:
+                chunk = spill.read(PCM_CHUNK)
+                if not chunk:
+                    break
+                for encoder in encoders:
+                    encoder.chunks.put(chunk)
+                sent += len(chunk)
+                progress_callback(min(99.0, 50 + sent / received * 49))
+            finite = math.isfinite(result.integrated)  # тиша або запис, коротший за 400 мс
+            timings["loudness"] = {"wall": analysis, "cpu": analysis_cpu, "target_lufs": loudness,
+                                   "input_lufs": round(result.integrated, 2) if finite else None,
+                                   "peak_dbfs": round(result.peak, 2) if math.isfinite(result.peak) else None,
+                                   "gain_db": round(gain, 2),
+                                   "output_lufs": round(result.integrated + gain, 2) if finite else None}
+    finally:
+        if spill:
+            spill.close()
+        errors = []
+        for encoder in encoders:
+            try: encoder.finish()
+            except Exception as e: errors.append(e)
+    if errors:
+        raise errors[0]
+    for encoder in encoders:
+        timings[encoder.name] = encoder.timing
+    progress_callback(100.0)
+    return timings
+
+# --- ПОТОКОВЕ ЗАВАНТАЖЕННЯ ---
+STREAM_CHUNK = 64 * 1024
+HTTP_CHUNK = 10 * 1024 * 1024
+HTTP_RETRIES = 5  # спроб поспіль без жодного нового байта
+HTTP_RETRY_DELAY = 0.5
+
+def can_stream(info, trim_val):
+    """Чи можна подати вибраний формат у ffmpeg напряму, без тимчасового файлу."""
+    if info.get('protocol') not in ('http', 'https') or not info.get('url'):
+        return False
+    if info.get('requested_formats'):
+        return False  # окремі відео та аудіо потребують злиття
+    # Без відомої тривалості не знаємо, де обрізати кінець
+    return not trim_val or bool(info.get('duration'))
+
+def iter_http_chunks(url, headers, total_size=None):
+    """Читає файл по HTTP шматками; відомий розмір качаємо діапазонами Range, щоб сервер не гальмував.
+
+    Обірване з'єднання не починає файл спочатку: наступний запит продовжує з останнього отриманого байта.
+    """
+    import http.client
+    import urllib.request
+    position = 0
+    failures = 0
+    while True:
+        req_headers = dict(headers or {})
+        if total_size:
+            req_headers['Range'] = f"bytes={position}-{min(position + HTTP_CHUNK, total_size) - 1}"
+        elif position:
+            req_headers['Range'] = f"bytes={position}-"
+        request = urllib.request.Request(url, headers=req_headers)
+        started_at = position
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                if position and response.status != 206:
+                    raise RuntimeError("Сервер не підтримує докачування (Range)")
+                while True:
+                    chunk = response.read(STREAM_CHUNK)
+                    if not chunk:
+                        break
+                    position += len(chunk)
+                    yield chunk
+                # http.client не скаржиться, якщо з'єднання закрилось раніше за Content-Length
+                broken = bool(response.length)
+        except (OSError, http.client.HTTPException):
+            broken = True
+        if broken or (total_size and position == started_at):
+            failures = 0 if position > started_at else failures + 1
+            if failures > HTTP_RETRIES:
+                raise ConnectionError(f"Завантаження обірвалось на {position} байті")
+            time.sleep(HTTP_RETRY_DELAY * max(1, failures))
+            continue
+        if not total_size or position >= total_size:
+            break
+
+def stream_extract(info, out_path, trim_val, progress_callback):
+    """Завантажує та кодує одночасно, без tk_temp на диску."""
+    total_size = info.get('filesize')
+    chunks = iter_http_chunks(info['url'], info.get('http_headers'), total_size)
+    codec = info.get('acodec') if info.get('acodec') == 'mp3' else None
+    FfmpegBackend().extract_stream(chunks, total_size or info.get('filesize_approx'), codec,
+                                   info.get('duration'), out_path, trim_val, progress_callback)
+
+# --- ЧЕРГА ЗАВДАНЬ ---
+JOBS_DIR = os.path.join(SETTINGS_DIR, 'jobs')
+# Недокачані файли за id відео: повторна спроба продовжує з останнього байта
+PARTIAL_DIR = os.path.join(SETTINGS_DIR, 'partial')
+PARTIAL_MAX_AGE = 7 * 24 * 3600
+DEFAULT_DOWNLOAD_WORKERS = 4
+DEFAULT_ENCODE_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+# Скільки завантажень одночасно з одного сайту (елементи плейлиста йдуть з одного хоста)
+DEFAULT_HOST_LIMIT = 3
+# Скільки фрагментів DASH/HLS качати паралельно в межах одного завантаження
+DEFAULT_FRAGMENT_WORKERS = 4
+# Джерела до стількох байт качаються в пам'ять і ffmpeg читає їх звідти, без запису на диск; 0 - завжди диск
+DEFAULT_MEMORY_LIMIT = 32 * 1024 * 1024
+# Як часто завдання, що чекає на слот кодування, перевіряє скасування
+SLOT_POLL = 0.5
+TRIM_MODES = ("fixed", "silence")  # фіксована кількість секунд або пошук тиші
+DEFAULT_LOUDNESS = -14.0  # LUFS, як у стрімінгових сервісів; для мовлення за EBU R128 - -23
+LOUDNESS_RANGE = (-50.0, -5.0)  # допустимі цілі, LUFS
+# Що вважається відео: діалог вибору файлів і стеження за папкою
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov", ".flv", ".webm")
+
+def safe_title(info):
+    # Чистимо назву від символів
+    return "".join(x for x in info.get('title', 'tiktok') if x.isalnum() or x in ' -_').strip()
+
+def source_host(url):
+    """Хост посилання без www., щоб youtube.com та www.youtube.com ділили один ліміт."""
+    host = urllib.parse.urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+def entry_url(entry):
+    """Посилання на елемент плейлиста; плоскі записи yt_dlp часто мають лише id та url."""
+    return entry.get('webpage_url') or entry.get('original_url') or entry.get('url')
+
+def partial_dir(info):
+    """Папка недокачаного файлу: екстрактор + id, тож повтор з будь-якого варіанта URL її знайде."""
+    key = f"{info.get('extractor_key') or info.get('extractor')}-{info['id']}"
+    return os.path.join(PARTIAL_DIR, re.sub(r'[^\w.-]', '_', key))
+
+def prune_partials(max_age=PARTIAL_MAX_AGE):
+    """Видаляє недокачані файли, які давно ніхто не продовжував."""
+    try: names = os.listdir(PARTIAL_DIR)
+    except OSError: return
+    now = time.time()
+    for name in names:
+        path = os.path.join(PARTIAL_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError: pass
+
+@dataclass
+class JobSpec:
+    """Що конвертувати і куди: посилання або шлях до файлу, папка результату та обрізка."""
+    source: str
+    output_dir: str
+    trim_seconds: float = 0.0
+    is_url: Optional[bool] = None
+    segment_workers: Optional[int] = None  # None - ядра порівну між поточними кодуваннями, 1 - без сегментів
+    formats: List[str] = field(default_factory=lambda: list(DEFAULT_FORMATS))  # напр. ["mp3", "opus:96k", "wav"]
+    trim_mode: str = "fixed"  # "silence" - обрізати тишу в кінці замість trim_seconds
+    trim_leading: bool = False  # у режимі "silence" обрізати тишу й на початку
+    skip_existing: bool = False  # не конвертувати, якщо всі результати вже є (так додаються елементи плейлиста)
+    loudness: Optional[float] = None  # ціль у LUFS: вирівняти гучність за EBU R128
+    replaces: List[str] = field(default_factory=list)  # власні попередні результати, які можна перезаписати (стеження)
+
+    def __post_init__(self):
+        if self.is_url is None:
+            self.is_url = self.source.startswith(("http://", "https://"))
+        if self.trim_mode not in TRIM_MODES:
+            raise ValueError(f"Невідомий режим обрізки: {self.trim_mode}")
+        for value in self.formats:
+            parse_format(value)
+        # NaN не проходить жодного порівняння, тож відсікається разом з нескінченностями
+        if self.loudness is not None and not LOUDNESS_RANGE[0] <= self.loudness <= LOUDNESS_RANGE[1]:
+            raise ValueError(f"Ціль гучності має бути від {LOUDNESS_RANGE[0]:g} до {LOUDNESS_RANGE[1]:g} LUFS: {self.loudness}")
+
+    @property
+    def plain_mp3(self):
+        """Лише MP3 з типовим бітрейтом і без зміни гучності - можна копіювати MP3 та кодувати сегментами чи потоком."""
+        return self.loudness is None and [parse_format(value) for value in self.formats] == [("mp3", MP3_BITRATE)]
+
+class Job:
+    """Стан одного завдання черги зі своєю тимчасовою папкою."""
+    def __init__(self, spec: JobSpec, job_id=None):
+        self.spec = spec
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.title = spec.source if spec.is_url else os.path.splitext(os.path.basename(spec.source))[0]
+        self.status = "queued"  # queued / expanding / downloading / waiting / streaming / analyzing / encoding / done / error / cancelled
+        self.progress = 0.0
+        self.outputs = {} if spec.is_url else output_paths(spec.output_dir, self.title, spec.formats)
+        self.out_path = next(iter(self.outputs.values()), None)  # перший формат - основний
+        # Кодування пише у власні тимчасові файли завдання; на місце outputs вони стають лише після успіху
+        self.temp_outputs = {}
+        self.timings = {}
+        self.error = None
+        self.report = None
+        # Кожне завдання качає у власну папку, щоб паралельні завдання не затирали одне одного
+        self.scratch_dir = os.path.join(JOBS_DIR, self.id)
+        self.target = None if spec.is_url else spec.source
+        self.audio_only = False
+        self.cache_key = None
+        self.cached = False
+        self.duration = None  # тривалість джерела, коли вона відома
+        self.media_length = None  # секунд звуку в поточному кодуванні (після обрізки)
+        self.submitted = time.monotonic()
+        self.stage_started = self.submitted
+        self.failed_stage = None
+        self.cancel_event = threading.Event()
+        self.claimed = False  # робочий потік уже взяв завдання (або його скасовано до старту)
+        self.children = []  # для плейлиста - завдання його елементів
+        self.skipped = False  # результати вже були на диску
+        self.loudness = None  # формат -> виміряна гучність і застосоване підсилення
+        self.memory_size = 0  # байт джерела в пам'яті; target тоді - його loopback URL
+
+    @property
+    def finished(self):
+        return self.status in ("done", "error", "cancelled")
+
+    @property
+    def temp_path(self):
+        """Тимчасовий файл основного формату."""
+        return next(iter(self.temp_outputs.values()), None)
+
+    @property
+    def speed(self):
+        """Швидкість кодування у разах від реального часу або None, поки її не видно."""
+        elapsed = time.monotonic() - self.stage_started
+        if self.status not in ("streaming", "encoding") or not self.media_length or self.progress <= 0 or elapsed <= 0:
+            return None
+        return self.media_length * self.progress / 100 / elapsed
+
+    @property
+    def eta(self):
+        """Секунд до кінця поточного етапу за середньою швидкістю етапу."""
+        if self.finished or self.status == "queued" or not 0 < self.progress < 100:
+            return None
+        elapsed = time.monotonic() - self.stage_started
+        return elapsed * (100 - self.progress) / self.progress
+
+class ProgressCallback(Protocol):
+    """Отримує завдання після кожної зміни стану чи прогресу (з робочого потоку)."""
+    def __call__(self, job: Job) -> None: ...
+
+class ProgressBus:
+    """Канал прогресу: робочі потоки лише позначають завдання, а UI забирає їх зі своєю частотою.
+
+    Скільки б оновлень не прийшло між двома опитуваннями, завдання віддається один раз
+    з найновішим станом, тож черга подій Tk не переповнюється на швидких кодуваннях.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dirty = {}
+
+    def __call__(self, job: Job) -> None:
+        with self._lock:
+            self._dirty[job.id] = job
+
+    def drain(self) -> List[Job]:
+        """Повертає завдання, що змінились після попереднього виклику."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        return list(dirty.values())
+
+@contextmanager
+def timed(job: Job, stage: str):
+    """Записує тривалість етапу в job.timings[stage], навіть якщо етап упав; в запис можна дописати свої поля."""
+    entry = job.timings.setdefault(stage, {})
+    started = time.perf_counter()
+    try:
+        yield entry
+    except BaseException:
+        job.failed_stage = job.failed_stage or stage  # найглибший етап, де виникла помилка
+        raise
+    finally:
+        entry["wall"] = time.perf_counter() - started
+
+def encode_params(spec: JobSpec):
+    """Параметри, від яких залежить результат; входять у ключ кешу."""
+    params = {'trim': spec.trim_seconds, 'formats': [list(parse_format(value)) for value in spec.formats]}
+    if spec.trim_mode == "silence":
+        params['trim'] = {'silence': True, 'leading': spec.trim_leading}
+    if spec.loudness is not None:
+        params['loudness'] = spec.loudness
+    return params
+
+class JobQueue:
+    """Черга з окремими лімітами: завантаження (потоки) та кодування (процеси ffmpeg)."""
+    def __init__(self, download_workers: int, encode_workers: int, on_update: ProgressCallback, cache=None, metrics=None,
+                 host_limit=DEFAULT_HOST_LIMIT, fragment_workers=DEFAULT_FRAGMENT_WORKERS, store=None,
+                 memory_limit=DEFAULT_MEMORY_LIMIT):
+        self.limits = (download_workers, encode_workers, host_limit)
+        self.download_pool = ThreadPoolExecutor(max_workers=download_workers, thread_name_prefix="download")
+        self.encode_pool = ThreadPoolExecutor(max_workers=encode_workers, thread_name_prefix="encode")
+        # Потокова конвертація теж займає слот кодування
+        self.encode_slots = threading.BoundedSemaphore(encode_workers)
+        self._encoding = 0  # зайнятих слотів кодування: між ними діляться ядра для сегментів
+        self.on_update = on_update
+        self.cache = cache
+        self.metrics = metrics  # metrics.JobMetrics або None
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._partials = set()  # папки недокачаних файлів, які зараз качаються
+        self._reserved = set()  # шляхи результатів незавершених завдань (os.path.normcase)
+        self.host_limit = host_limit
+        self.fragment_workers = fragment_workers
+        self._host_active = {}  # хост -> скільки завантажень з нього йде
+        self._host_waiting = {}  # хост -> deque завдань, що чекають на його слот (без робочого потоку)
+        self.live = {}  # id -> незавершене завдання, разом з елементами розгорнутих плейлистів
+        self._followers = {}  # id завдання -> дублікати, що чекають на його результат
+        self.store = store  # jobstore.JobStore або None
+        self.interrupted = False
+        self.memory_limit = memory_limit
+        # Буфер живе від завантаження до кінця кодування, тож бюджет - по ліміту на кожен робочий потік
+        self.memory_budget = memory_limit * (download_workers + encode_workers)
+        self._memory_used = 0
+        self._memory = None  # memsource.MemorySources, з'являється з першим буфером
+        prune_partials()
+
+    def submit(self, job: Job):
+        with self._idle:
+            self._pending += 1
+            self.live[job.id] = job
+        if self.store:
+            if self._duplicate(job):
+                return
+            self.store.add(job)
+        if job.spec.is_url:
+            self.download_pool.submit(self._start, job, self._download)
+        else:
+            self.encode_pool.submit(self._start, job, self._encode)
+
+    def cancel(self, job: Job):
+        """Скасовує завдання: запущене зупиняється протягом секунди, ще не почате - одразу."""
+        job.cancel_event.set()
+        if self._claim(job) or self._detach(job):
+            self._complete(job, JobCancelled())
+        for child in list(job.children):
+            self.cancel(child)
+
+    def interrupt(self):
+        """Зупиняє всі завдання, але в журналі вони лишаються незавершеними й продовжаться після перезапуску."""
+        self.interrupted = True
+        with self._idle:
+            jobs = list(self.live.values())
+        for job in jobs:
+            self.cancel(job)
+
+    def _duplicate(self, job):
+        """Те саме вже сконвертовано (і файли на місці) або саме конвертується: завдання обходиться без роботи.
+
+        Дублікат незавершеного завдання чекає на нього і закривається з його статусом і файлами.
+        """
+        with self._idle:
+            live = set(self.live) - {job.id}
+        row = self.store.find_duplicate(job.spec, live)
+        if row is None:
+            return False
+        job.claimed = True
+        if row["id"] in live:
+            with self._idle:
+                original = self.live.get(row["id"])
+                if original is not None:
+                    self._followers.setdefault(original.id, []).append(job)
+                    return True
+            job.claimed = False
+            return self._duplicate(job)  # оригінал щойно завершився: дивимось на його підсумок
+        job.title = row["title"] or job.title
+        job.outputs = row["outputs"]
+        job.out_path = next(iter(job.outputs.values()), None)
+        job.skipped = True
+        self._complete(job)
+        return True
+
+    def _detach(self, job):
+        """Прибирає дублікат з очікування; True, якщо він там був."""
+        with self._idle:
+            for followers in self._followers.values():
+                if job in followers:
+                    followers.remove(job)
+                    return True
+        return False
+
+    def _follow(self, job, original, error):
+        """Закриває дублікат з результатом завдання, на яке він чекав."""
+        job.title = original.title
+        job.outputs = dict(original.outputs)
+        job.out_path = original.out_path
+        job.report = original.report
+        job.skipped = original.status == "done"
+        self._complete(job, JobCancelled() if original.status == "cancelled" else error)
+
+    def _claim(self, job):
+        with self._idle:
+            if job.claimed:
+                return False
+            job.claimed = True
+            return True
+
+    def _start(self, job, stage):
+        if self._claim(job):
+            stage(job)
+
+    @contextmanager
+    def _encode_slot(self, job):
+        """Слот кодування; скасування діє і поки завдання чекає на вільний."""
+        self._check_cancel(job)
+        while not self.encode_slots.acquire(timeout=SLOT_POLL):
+            self._check_cancel(job)
+        with self._idle:
+            self._encoding += 1
+        try:
+            yield
+        finally:
+            with self._idle:
+                self._encoding -= 1
+            self.encode_slots.release()
+
+    def _check_cancel(self, job):
+        if job.cancel_event.is_set():
+            raise JobCancelled()
+
+    def _progress(self, job):
+        """Колбек прогресу для рушіїв; після скасування він кидає JobCancelled і рушій зупиняє ffmpeg."""
+        def report(progress):
+            self._check_cancel(job)
+            self._set(job, progress=progress)
+        return report
+
+    def wait(self, timeout=None):
+        """Блокує, доки всі надіслані завдання не завершаться."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def shutdown(self):
+        self.download_pool.shutdown(wait=False)
+        self.encode_pool.shutdown(wait=False)
+        if self._memory:
+            self._memory.close()
+
+    def _set(self, job, status=None, progress=None):
+        if status is not None:
+            changed = status != job.status
+            if changed:
+                job.stage_started = time.monotonic()
+            job.status = status
+            # Перервані закриттям завдання лишаються в журналі зі старим станом, щоб продовжитись
+            if self.store and changed and not (self.interrupted and status == "cancelled"):
+                try: self.store.update(job)
+                except Exception: pass  # журнал не має ламати конвертацію
+        if progress is not None:
+            job.progress = progress
+        self.on_update(job)
+
+    def _download(self, job):
+        """Займає слот хоста; якщо всі зайняті, завдання стає в чергу хоста і потік бере наступне."""
+        host = source_host(job.spec.source)
+        with self._idle:
+            # Скасування бачимо під тим самим замком, що й cancel у _claim
+            if self._host_active.get(host, 0) >= self.host_limit and not job.cancel_event.is_set():
+                job.claimed = False  # поки чекає, cancel закриває його одразу
+                self._host_waiting.setdefault(host, collections.deque()).append(job)
+                return
+            self._host_active[host] = self._host_active.get(host, 0) + 1
+        self._run_download(job, host)
+
+    def _run_download(self, job, host):
+        try:
+            try:
+                self._check_cancel(job)
+                self._fetch(job)
+            finally:
+                self._release_host(host)
+        except Exception as e:
+            self._complete(job, e)
+
+    def _release_host(self, host):
+        """Передає слот хоста першому нескасованому завданню з його черги або звільняє слот."""
+        with self._idle:
+            waiting = self._host_waiting.get(host)
+            while waiting:
+                job = waiting.popleft()
+                if not job.claimed:  # скасоване вже закрив cancel
+                    job.claimed = True
+                    break
+            else:
+                self._host_active[host] -= 1
+                return
+        try: self.download_pool.submit(self._run_download, job, host)
+        except RuntimeError: pass  # черга вже зупинена
+
+    def _fetch(self, job):
+        """Читає інформацію про посилання і розгортає плейлист або качає джерело."""
+        import yt_dlp
+        spec = job.spec
+
+        def hook(d):
+            self._check_cancel(job)  # yt_dlp викликає хук на кожен прочитаний блок
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            if d.get('status') == 'downloading' and total:
+                self._set(job, progress=d.get('downloaded_bytes', 0) / total * 100)
+
+        # Без overwrites: yt_dlp продовжує .part-файл з попередньої спроби і не качає вдруге готовий
+        ydl_opts = {'format': AUDIO_FORMAT, 'quiet': True, 'noprogress': True, 'continuedl': True,
+                    'lazy_playlist': True, 'concurrent_fragment_downloads': self.fragment_workers,
+                    'progress_hooks': [hook]}
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            with timed(job, "extract"):
+                # process=False не розгортає плейлист: елементи читаються сторінками по ходу
+                info = ydl.extract_info(spec.source, download=False, process=False)
+                if info.get('_type') not in ('playlist', 'multi_video'):
+                    info = ydl.process_ie_result(info, download=False)
+            if info.get('_type') in ('playlist', 'multi_video'):
+                self._expand(job, info)
+                return
+            if job.title == spec.source:
+                # Назву з плоского запису плейлиста (чи з журналу після перезапуску) не перезаписуємо
+                job.title = safe_title(info)
+            job.outputs = output_paths(spec.output_dir, job.title, spec.formats)
+            job.out_path = next(iter(job.outputs.values()))
+            if spec.skip_existing and self._skip_if_exists(job):
+                return
+            self._reserve_outputs(job)
+            job.report = describe_download(info)
+            job.duration = info.get('duration')
+            if self.cache and info.get('id') and len(job.outputs) == 1:
+                job.cache_key = self.cache.key_for_url(info, encode_params(spec))
+                if self._from_cache(job):
+                    return
+
+            # Пошук тиші читає кінець файлу, тож потокова конвертація тут не підходить
+            if (spec.plain_mp3 and spec.trim_mode == "fixed" and can_stream(info, spec.trim_seconds)
+                    and FfmpegBackend().available()):
+                self._set(job, "waiting", 0)
+                with self._encode_slot(job):
+                    job.media_length = max(0.0, job.duration - spec.trim_seconds) if job.duration else None
+                    self._set(job, "streaming", 0)
+                    try:
+                        self._check_cancel(job)
+                        os.makedirs(spec.output_dir, exist_ok=True)
+                        with timed(job, "stream"):
+                            stream_extract(info, job.temp_path, spec.trim_seconds, self._progress(job))
+                        self._complete(job)
+                        return
+                    except JobCancelled:
+                        raise
+                    except Exception:
+                        # Повертаємось до завантаження у файл; недописаний результат не лишаємо
+                        try: os.remove(job.temp_path)
+                        except OSError: pass
+
+            self._set(job, "downloading", 0)
+            with timed(job, "download") as span:
+                head = self._download_to_memory(job, info) if self._fits_in_memory(info) else None
+                if not job.memory_size:
+                    self._use_scratch(job, info)
+                    ydl.params['outtmpl'] = {'default': os.path.join(job.scratch_dir, 'source.%(ext)s')}
+                    if head:
+                        # Файл виявився більшим за ліміт: отримане стає .part, і yt_dlp докачує решту (continuedl)
+                        with open(ydl.prepare_filename(info) + '.part', 'wb') as f:
+                            f.write(head)
+                    info = ydl.process_ie_result(info, download=True)
+                    downloads = info.get('requested_downloads') or [{}]
+                    job.target = downloads[0].get('filepath') or ydl.prepare_filename(info)
+                span["scratch"] = "memory" if job.memory_size else "disk"
+            if job.memory_size or os.path.exists(job.target):
+                span["bytes"] = job.memory_size or os.path.getsize(job.target)
+                span["bytes_per_sec"] = span["bytes"] / span["wall"] if span["wall"] else None
+        job.audio_only = is_audio_only(info)
+        # Завантажене знову чекає в черзі: cancel() закриває його одразу, не дочікуючись слота
+        self._set(job, "waiting", 0)
+        with self._idle:
+            job.claimed = False
+        self.encode_pool.submit(self._start, job, self._encode)
+
+    def _expand(self, job, info):
+        """Додає кожен елемент плейлиста окремим завданням, щойно yt_dlp його прочитав."""
+        job.title = safe_title(info) or job.spec.source
+        total = info.get('playlist_count')
+        self._set(job, "expanding", 0)
+        names = set()
+        for index, entry in enumerate(info.get('entries') or [], 1):
+            self._check_cancel(job)
+            url = entry and entry_url(entry)
+            if not url:
+                continue  # недоступний елемент
+            # Усі параметри батьківського завдання (формати, обрізка, гучність, ...) переходять до елемента
+            spec = replace(job.spec, source=url, is_url=True, skip_existing=True)
+            child = Job(spec)
+            title = entry.get('title') and safe_title(entry)
+            if title:
+                # Назва вже є у плоскому записі: наявні файли пропускаємо без жодного запиту.
+                # Однакові назви в одному плейлисті розрізняються id або номером елемента
+                if os.path.normcase(title) in names:
+                    item_id = re.sub(r'[^\w-]', '_', str(entry.get('id') or ''))
+                    title += f" [{item_id}]" if item_id else f" #{index}"
+                names.add(os.path.normcase(title))
+                child.title = title
+                child.outputs = output_paths(spec.output_dir, child.title, spec.formats)
+                child.out_path = next(iter(child.outputs.values()))
+            job.children.append(child)
+            if child.outputs and all(os.path.exists(path) for path in child.outputs.values()):
+                with self._idle:
+                    self._pending += 1
+                    self.live[child.id] = child
+                child.claimed = True
+                self._skip_if_exists(child)
+            else:
+                self.submit(child)
+            self._set(job, progress=len(job.children) / total * 100 if total else None)
+        self._complete(job)
+
+    def _skip_if_exists(self, job):
+        if not all(os.path.exists(path) for path in job.outputs.values()):
+            return False
+        job.skipped = True
+        self._complete(job)
+        return True
+
+    def _encode(self, job):
+        try:
+            if not job.temp_outputs:
+                self._reserve_outputs(job)  # локальний файл; завантажене отримало шляхи ще в _fetch
+            if self.cache and not job.spec.is_url and len(job.outputs) == 1:
+                job.cache_key = self.cache.key_for_file(job.spec.source, encode_params(job.spec))
+                if self._from_cache(job):
+                    return
+            with self._encode_slot(job):
+                start, trim_val = self._trim_bounds(job)
+                if job.duration is None:
+                    with timed(job, "probe"):
+                        media = probe_media(job.target)
+                    job.duration = media.duration
+                    if not job.spec.is_url:
+                        job.audio_only = not media.video
+                job.media_length = max(0.0, job.duration - trim_val - start) if job.duration else None
+                self._set(job, "encoding", 0)
+                os.makedirs(job.spec.output_dir, exist_ok=True)
+                if job.spec.plain_mp3:
+                    with timed(job, "encode"):
+                        extract_audio(job.target, job.temp_path, trim_val, self._progress(job),
+                                      job.audio_only, self._segment_workers(job), start)
+                else:
+                    # Окремо ще етапи decode та кожного формату з процесорним часом
+                    with timed(job, "encode"):
+                        job.timings.update(fan_out_extract(job.target, job.temp_outputs, job.spec.formats, trim_val,
+                                                           self._progress(job), start, job.spec.loudness))
+                    if "loudness" in job.timings:
+                        measured = {key: value for key, value in job.timings["loudness"].items() if key not in ("wall", "cpu")}
+                        job.loudness = {name: dict(measured) for name in job.outputs}
+            self._complete(job)
+        except Exception as e:
+            self._complete(job, e)
+
+    def _segment_workers(self, job):
+        """Явне значення із завдання або ядра порівну між кодуваннями, що йдуть зараз.
+
+        Самотній довгий запис ріжеться на всі ядра, а повна черга не запускає ядер² процесів ffmpeg.
+        """
+        if job.spec.segment_workers is not None:
+            return job.spec.segment_workers
+        with self._idle:
+            return max(1, (os.cpu_count() or 1) // max(1, self._encoding))
+
+    def _trim_bounds(self, job):
+        """Повертає (початок, секунд обрізати з кінця) з урахуванням режиму обрізки."""
+        if job.spec.trim_mode != "silence":
+            return 0.0, job.spec.trim_seconds
+        self._set(job, "analyzing", 0)
+        with timed(job, "analyze"):
+            try:
+                from silence import find_bounds
+                bounds = find_bounds(job.target, job.spec.trim_leading)
+            except Exception:
+                return 0.0, 0.0  # Без аналізу конвертуємо весь запис
+        job.duration = bounds.duration
+        return bounds.start, max(0.0, bounds.duration - bounds.end)
+
+    def _fits_in_memory(self, info):
+        """Один файл по HTTP не більший за memory_limit, і на диску немає його недокачаної копії."""
+        if not self.memory_limit or not can_stream(info, 0) or not get_ffmpeg_exe():
+            return False
+        size = info.get('filesize') or info.get('filesize_approx')
+        if size and size > self.memory_limit:
+            return False
+        return not (info.get('id') and os.path.isdir(partial_dir(info)))
+
+    def _download_to_memory(self, job, info):
+        """Качає джерело в буфер і публікує його для ffmpeg; тоді повертає None.
+
+        Інакше повертає вже отримані байти (файл без відомого розміру переріс ліміт), щоб диск
+        продовжив з того ж місця, або b"", якщо бюджет пам'яті вичерпано чи завантаження не вдалося.
+        """
+        size = info.get('filesize')
+        reserve = min(size or self.memory_limit, self.memory_limit)
+        with self._idle:
+            if self._memory_used + reserve > self.memory_budget:
+                return b""
+            self._memory_used += reserve
+        expected = size or info.get('filesize_approx')
+        buffer = bytearray()
+        kept = False
+        try:
+            for chunk in iter_http_chunks(info['url'], info.get('http_headers'), size):
+                self._check_cancel(job)
+                buffer += chunk
+                if len(buffer) > self.memory_limit:
+                    return buffer
+                if expected:
+                    self._set(job, progress=min(100.0, len(buffer) / expected * 100))
+            if not buffer:
+                return b""
+            with self._idle:
+                if self._memory is None:
+                    from memsource import MemorySources
+                    self._memory = MemorySources()
+                self._memory_used += len(buffer) - reserve
+                kept = True
+            job.memory_size = len(buffer)
+            job.target = self._memory.add(buffer, info.get('ext'))
+            return None
+        except JobCancelled:
+            raise
+        except Exception:
+            return b""  # yt_dlp спробує сам, через диск
+        finally:
+            if not kept:
+                with self._idle:
+                    self._memory_used -= reserve
+
+    def _reserve_outputs(self, job):
+        """Закріплює за завданням власні шляхи результатів і тимчасові файли для кодування.
+
+        Якщо "назва.mp3" уже є на диску або його пише інше завдання черги, береться "назва (2).mp3" і далі.
+        Файли з spec.replaces не заважають: змінене відео під стеженням замінює свій попередній результат.
+        """
+        replaceable = {os.path.normcase(os.path.abspath(path)) for path in job.spec.replaces}
+        with self._idle:
+            for number in itertools.count(1):
+                title = job.title if number == 1 else f"{job.title} ({number})"
+                outputs = output_paths(job.spec.output_dir, title, job.spec.formats)
+                keys = {os.path.normcase(os.path.abspath(path)) for path in outputs.values()}
+                if not keys & self._reserved and not any(os.path.exists(path) for path in outputs.values()
+                                                         if os.path.normcase(os.path.abspath(path)) not in replaceable):
+                    break
+            self._reserved |= keys
+        job.outputs = outputs
+        job.out_path = next(iter(outputs.values()))
+        job.temp_outputs = {name: temp_output_path(path, job.id) for name, path in outputs.items()}
+
+    def _release_outputs(self, job, publish):
+        """Ставить тимчасові файли на місце результатів (publish) або видаляє їх і звільняє шляхи."""
+        try:
+            if publish:
+                for name, temp in job.temp_outputs.items():
+                    os.replace(temp, job.outputs[name])
+        finally:
+            for temp in job.temp_outputs.values():
+                try: os.remove(temp)  # недописані файли; після успіху їх уже немає
+                except OSError: pass
+            with self._idle:
+                self._reserved -= {os.path.normcase(os.path.abspath(path)) for path in job.outputs.values()}
+            job.temp_outputs = {}
+
+    def _use_scratch(self, job, info):
+        """Качаємо в папку недокачаного файлу цього відео, якщо її не зайняло інше завдання."""
+        if info.get('id'):
+            path = partial_dir(info)
+            with self._idle:
+                if path not in self._partials:
+                    self._partials.add(path)
+                    job.scratch_dir = path
+        os.makedirs(job.scratch_dir, exist_ok=True)
+        os.utime(job.scratch_dir)  # prune_partials рахує вік від останньої спроби
+
+    def _from_cache(self, job):
+        os.makedirs(job.spec.output_dir, exist_ok=True)
+        try:
+            if not self.cache.get(job.cache_key, job.temp_path):
+                return False
+        except OSError:
+            return False  # Кеш - лише прискорення: при збої джерело конвертується як звичайно
+        job.cached = True
+        self._complete(job)
+        return True
+
+    def _complete(self, job, error=None):
+        if job.temp_outputs:
+            try:
+                self._release_outputs(job, publish=error is None)
+            except OSError as e:
+                error = error or e
+        # yt_dlp загортає виняток з хука у свій DownloadError
+        cancelled = error is not None and (isinstance(error, JobCancelled) or job.cancel_event.is_set())
+        job.failed_stage = (job.failed_stage or job.status) if error and not cancelled else None
+        with timed(job, "cleanup"):
+            if self.cache and job.cache_key and not error and not job.cached:
+                try: self.cache.put(job.cache_key, job.out_path)
+                except OSError: pass  # Кеш - лише прискорення, його збій не ламає завдання
+            if job.memory_size:
+                self._memory.remove(job.target)
+                with self._idle:
+                    self._memory_used -= job.memory_size
+            # Недокачаний файл лишається для наступної спроби; після успіху він уже не потрібен
+            partial = job.scratch_dir.startswith(PARTIAL_DIR)
+            if job.spec.is_url and (not error or not partial):
+                shutil.rmtree(job.scratch_dir, ignore_errors=True)
+            if partial:
+                with self._idle:
+                    self._partials.discard(job.scratch_dir)
+        job.error = str(error) if error and not cancelled else None
+        status = "cancelled" if cancelled else "error" if error else "done"
+        try:
+            self._set(job, status, job.progress if error else 100.0)
+            if self.metrics:
+                self.metrics.job_finished(job, None if cancelled else error)
+        finally:
+            with self._idle:
+                self._pending -= 1
+                self.live.pop(job.id, None)
+                followers = self._followers.pop(job.id, [])
+                self._idle.notify_all()
+            for follower in followers:
+                self._follow(follower, job, error)
+
+def run_jobs(specs, on_update: ProgressCallback, download_workers=DEFAULT_DOWNLOAD_WORKERS,
+             encode_workers=DEFAULT_ENCODE_WORKERS, cache=None, metrics=None,
+             host_limit=DEFAULT_HOST_LIMIT, fragment_workers=DEFAULT_FRAGMENT_WORKERS, store=None, resume=False,
+             memory_limit=DEFAULT_MEMORY_LIMIT):
+    """Виконує завдання до кінця і повертає їх разом з елементами плейлистів; зручно для скриптів і CLI.
+
+    З resume спершу продовжуються незавершені завдання з журналу store.
+    """
+    queue = JobQueue(download_workers, encode_workers, on_update, cache, metrics, host_limit, fragment_workers, store,
+                     memory_limit)
+    jobs = (store.pending() if store and resume else []) + [Job(spec) for spec in specs]
+    try:
+        for job in jobs:
+            queue.submit(job)
+        queue.wait()
+    except KeyboardInterrupt:
+        # Ctrl+C: зупиняємо ffmpeg і зберігаємо недокачане для наступного запуску
+        queue.interrupt()
+        queue.wait(timeout=5)
+        raise
+    finally:
+        queue.shutdown()
+    return list(_with_children(jobs))
+
+def _with_children(jobs):
+    for job in jobs:
+        yield job
+        yield from _with_children(job.children)
@@ -0,0 +1,154 @@
+"""Журнал завдань у SQLite в SETTINGS_DIR: історія, пошук дублікатів за індексом і відновлення черги після збою."""
+import dataclasses
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from engine import SETTINGS_DIR, Job, JobSpec, encode_params
+
+DB_PATH = os.path.join(SETTINGS_DIR, 'jobs.sqlite3')
+FINISHED = ("done", "error", "cancelled")
+HISTORY_LIMIT = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    dedupe_key TEXT NOT NULL,
+    source TEXT NOT NULL,
+    title TEXT,
+    spec TEXT NOT NULL,
+    status TEXT NOT NULL,
+    outputs TEXT,
+    timings TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs (dedupe_key, updated);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created);
+CREATE TABLE IF NOT EXISTS watched (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    job_id TEXT,
+    updated REAL NOT NULL
+);
+"""
+
+def dedupe_key(spec):
+    """Те саме джерело з тими самими параметрами в ту саму папку; для файлу враховуються розмір і час зміни."""
+    source = [spec.source]
+    if not spec.is_url:
+        try:
+            stat = os.stat(spec.source)
+            source += [stat.st_size, stat.st_mtime_ns]
+        except OSError: pass
+    payload = json.dumps([source, os.path.abspath(spec.output_dir), encode_params(spec)], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class JobStore:
+    """Один рядок на завдання; черга пише в нього лише при зміні стану, а не на кожен відсоток."""
+    def __init__(self, path=DB_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        # Одне з'єднання на всі робочі потоки, доступ - під self.lock
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        with self.lock, self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.executescript(SCHEMA)
+
+    def add(self, job):
+        now = time.time()
+        spec = json.dumps(dataclasses.asdict(job.spec), ensure_ascii=False)
+        with self.lock, self.db:
+            # Продовжене після перезапуску завдання зберігає свій рядок і час додавання
+            self.db.execute("INSERT INTO jobs (id, dedupe_key, source, title, spec, status, created, updated)"
+                            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                            " ON CONFLICT (id) DO UPDATE SET status=excluded.status, updated=excluded.updated",
+                            (job.id, dedupe_key(job.spec), job.spec.source, job.title, spec, job.status, now, now))
+
+    def update(self, job):
+        """Оновлює стан; завдання, яких немає в журналі (дублікати, пропущені елементи плейлиста), ігноруються."""
+        with self.lock, self.db:
+            self.db.execute("UPDATE jobs SET title=?, status=?, outputs=?, timings=?, error=?, updated=? WHERE id=?",
+                            (job.title, job.status, json.dumps(job.outputs, ensure_ascii=False),
+                             json.dumps(job.timings, default=str), job.error, time.time(), job.id))
+
+    def find_duplicate(self, spec, live_ids=()):
+        """Попереднє завдання з тим самим ключем: готове, і всі його файли на місці, або ще виконується в цій черзі."""
+        with self.lock:
+            rows = self.db.execute("SELECT * FROM jobs WHERE dedupe_key=? ORDER BY updated DESC LIMIT 5",
+                                   (dedupe_key(spec),)).fetchall()
+        for row in rows:
+            if row["status"] == "done":
+                outputs = json.loads(row["outputs"] or "{}")
+                if outputs and all(os.path.exists(path) for path in outputs.values()):
+                    return dict(row, outputs=outputs)
+            elif row["status"] not in FINISHED and row["id"] in live_ids:
+                return dict(row, outputs=json.loads(row["outputs"] or "{}"))
+        return None
+
+    def pending(self):
+        """Завдання, які не завершились до збою чи закриття, - у порядку додавання і з тими самими id."""
+        with self.lock:
+            rows = self.db.execute("SELECT id, title, spec FROM jobs WHERE status NOT IN (?, ?, ?) ORDER BY created",
+                                   FINISHED).fetchall()
+        jobs = []
+        for row in rows:
+            try:
+                job = Job(JobSpec(**json.loads(row["spec"])), job_id=row["id"])
+            except (TypeError, ValueError):
+                continue  # параметри зі старої версії
+            job.title = row["title"] or job.title
+            jobs.append(job)
+        return jobs
+
+    def get(self, job_id):
+        """Рядок завдання за id (для завдань минулих запусків) або None."""
+        with self.lock:
+            row = self.db.execute("SELECT id, source, title, status, outputs, error, created FROM jobs WHERE id=?",
+                                  (job_id,)).fetchone()
+        return dict(row, outputs=json.loads(row["outputs"] or "{}")) if row else None
+
+    def history(self, query="", limit=HISTORY_LIMIT):
+        """Останні завдання, новіші спершу; query шукається в назві та джерелі."""
+        sql = "SELECT id, source, title, status, outputs, error, created FROM jobs"
+        params = []
+        if query:
+            sql += " WHERE title LIKE ? OR source LIKE ?"
+            params += [f"%{query}%"] * 2
+        sql += " ORDER BY created DESC LIMIT ?"
+        with self.lock:
+            rows = self.db.execute(sql, params + [limit]).fetchall()
+        return [dict(row, outputs=json.loads(row["outputs"] or "{}")) for row in rows]
+
+    def watched_files(self, root):
+        """Індекс файлів під root, уже відданих у чергу стеженням за папкою: шлях -> (розмір, mtime_ns)."""
+        prefix = os.path.join(os.path.abspath(root), "")
+        with self.lock:
+            # Діапазон по первинному ключу замість LIKE: шляхи можуть містити % та _
+            rows = self.db.execute("SELECT path, size, mtime_ns FROM watched WHERE path >= ? AND path < ?",
+                                   (prefix, prefix + "\U0010ffff")).fetchall()
+        return {row["path"]: (row["size"], row["mtime_ns"]) for row in rows}
+
+    def watched_outputs(self, path):
+        """Результати останнього успішного завдання для файлу під стеженням."""
+        with self.lock:
+            row = self.db.execute("SELECT jobs.outputs FROM watched JOIN jobs ON jobs.id = watched.job_id"
+                                  " WHERE watched.path=?", (path,)).fetchone()
+        return list(json.loads(row["outputs"] or "{}").values()) if row else []
+
+    def mark_watched(self, path, size, mtime_ns, job_id):
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO watched (path, size, mtime_ns, job_id, updated) VALUES (?, ?, ?, ?, ?)",
+                            (path, size, mtime_ns, job_id, time.time()))
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,81 @@
+"""Невеликі завантаження в пам'яті: ffmpeg читає їх з loopback HTTP з підтримкою Range, без файлу на диску.
+
+Через stdin ffmpeg не перемотує, а проба, пошук тиші та сегментне кодування відкривають джерело
+кілька разів; MP4 з індексом у кінці з труби не читається взагалі. HTTP-вхід ffmpeg перемотує
+запитами Range, тож усі ці шляхи працюють з буфером так само, як з файлом.
+"""
+import re
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class MemorySources:
+    """Буфери на 127.0.0.1, кожен під випадковим шляхом; сервер живе у фоновому потоці до close()."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buffers = {}  # шлях -> bytes або bytearray
+        sources = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_HEAD(self):
+                self._send(False)
+
+            def do_GET(self):
+                self._send(True)
+
+            def _send(self, with_body):
+                with sources.lock:
+                    data = sources.buffers.get(self.path)
+                if data is None:
+                    self.send_error(404)
+                    return
+                size = len(data)
+                start, end = 0, size - 1
+                match = re.fullmatch(r"bytes=(\d*)-(\d*)", self.headers.get("Range", ""))
+                if match and (match[1] or match[2]):
+                    if match[1]:
+                        start = int(match[1])
+                        end = min(end, int(match[2])) if match[2] else end
+                    else:
+                        start = max(0, size - int(match[2]))  # останні N байт
+                    if start >= size or start > end:
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{size}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Content-Length", str(end - start + 1))
+                self.end_headers()
+                if with_body:
+                    try: self.wfile.write(memoryview(data)[start:end + 1])
+                    except OSError: pass  # ffmpeg перемотав і закрив з'єднання, не дочитавши
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="memory-sources", daemon=True).start()
+
+    def add(self, data, ext=""):
+        """Публікує буфер і повертає його URL; розширення допомагає ffmpeg вгадати контейнер."""
+        ext = re.sub(r"\W", "", ext or "")
+        path = f"/{secrets.token_urlsafe(16)}" + (f".{ext}" if ext else "")
+        with self.lock:
+            self.buffers[path] = data
+        return f"http://127.0.0.1:{self.server.server_address[1]}{path}"
+
+    def remove(self, url):
+        path = "/" + url.split("/", 3)[-1]
+        with self.lock:
+            self.buffers.pop(path, None)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,158 @@
+"""Метрики завдань: журнал JSON Lines з ротацією в SETTINGS_DIR та текстовий ендпоінт Prometheus на localhost."""
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+
+from engine import SETTINGS_DIR, report_fields
+
+LOG_PATH = os.path.join(SETTINGS_DIR, 'logs', 'jobs.jsonl')
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+# Межі гістограм у секундах: від миттєвих попадань у кеш до годинних записів
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+# Етапи, що пишуть або читають завантажене джерело
+SCRATCH_STAGES = ("download", "probe", "analyze", "encode", "cleanup")
+
+class Histogram:
+    """Кумулятивна гістограма у форматі Prometheus."""
+    def __init__(self):
+        self.counts = [0] * len(SECONDS_BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(SECONDS_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels=""):
+        sep = "," if labels else ""
+        lines = [f'{name}_bucket{{{labels}{sep}le="{bound}"}} {count}' for bound, count in zip(SECONDS_BUCKETS, self.counts)]
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum:.6f}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+def _make_logger(path):
+    logger = logging.getLogger(f"videotomp3.jobs.{path}")
+    if not logger.handlers:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+class JobMetrics:
+    """Підсумки завершених завдань: рядок у журналі на кожне завдання та лічильники для Prometheus."""
+    def __init__(self, log_path=LOG_PATH):
+        self.lock = threading.Lock()
+        self.jobs = {}  # (статус, з кешу) -> кількість
+        self.stages = {}  # етап -> Histogram
+        self.scratch_stages = {}  # (куди качалось джерело: memory/disk, етап) -> Histogram
+        self.job_seconds = Histogram()
+        self.download_bytes = 0
+        self.media_seconds = 0.0
+        self.logger = _make_logger(log_path) if log_path else None
+
+    def job_finished(self, job, error=None):
+        """Викликається чергою для кожного завершеного завдання; збій запису не ламає завдання."""
+        try:
+            self._record(job, error)
+        except Exception:
+            pass
+
+    def _record(self, job, error):
+        elapsed = time.monotonic() - job.submitted
+        record = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "job": job.id,
+            "source": job.spec.source,
+            "title": job.title,
+            "status": job.status,
+            "cached": job.cached,
+            "seconds": round(elapsed, 3),
+            "media_seconds": job.media_length,
+            "formats": job.spec.formats,
+            "stages": job.timings,
+        }
+        if job.loudness:
+            record["loudness"] = job.loudness
+        if job.report:
+            record["report"] = report_fields(job)
+        if error is not None:
+            record["stage"] = job.failed_stage
+            record["error"] = job.error
+            record["error_type"] = type(error).__name__
+            record["traceback"] = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+        with self.lock:
+            key = (job.status, job.cached)
+            self.jobs[key] = self.jobs.get(key, 0) + 1
+            self.job_seconds.observe(elapsed)
+            for stage, timing in job.timings.items():
+                if timing.get("wall") is not None:
+                    self.stages.setdefault(stage, Histogram()).observe(timing["wall"])
+            self.download_bytes += job.timings.get("download", {}).get("bytes", 0)
+            # Ті самі етапи окремо для джерел у пам'яті та на диску, щоб порівнювати затримку обох шляхів
+            scratch = job.timings.get("download", {}).get("scratch")
+            if scratch:
+                for stage in SCRATCH_STAGES:
+                    if job.timings.get(stage, {}).get("wall") is not None:
+                        self.scratch_stages.setdefault((scratch, stage), Histogram()).observe(job.timings[stage]["wall"])
+            if job.status == "done" and job.media_length:
+                self.media_seconds += job.media_length
+        if self.logger:
+            self.logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+    def render(self):
+        """Усі метрики в текстовому форматі Prometheus."""
+        with self.lock:
+            lines = ["# HELP vtm_jobs_total Finished jobs by status.", "# TYPE vtm_jobs_total counter"]
+            for (status, cached), count in sorted(self.jobs.items()):
+                lines.append(f'vtm_jobs_total{{status="{status}",cached="{str(cached).lower()}"}} {count}')
+            lines += ["# HELP vtm_job_seconds Time from submit to finish.", "# TYPE vtm_job_seconds histogram"]
+            lines += self.job_seconds.render("vtm_job_seconds")
+            lines += ["# HELP vtm_stage_seconds Wall time per job stage.", "# TYPE vtm_stage_seconds histogram"]
+            for stage, histogram in sorted(self.stages.items()):
+                lines += histogram.render("vtm_stage_seconds", f'stage="{stage}"')
+            lines += ["# HELP vtm_scratch_stage_seconds Wall time of source-reading stages by where the download was kept.",
+                      "# TYPE vtm_scratch_stage_seconds histogram"]
+            for (scratch, stage), histogram in sorted(self.scratch_stages.items()):
+                lines += histogram.render("vtm_scratch_stage_seconds", f'scratch="{scratch}",stage="{stage}"')
+            lines += ["# HELP vtm_download_bytes_total Bytes downloaded to scratch files or memory.", "# TYPE vtm_download_bytes_total counter",
+                      f"vtm_download_bytes_total {self.download_bytes}",
+                      "# HELP vtm_media_seconds_total Seconds of audio converted.", "# TYPE vtm_media_seconds_total counter",
+                      f"vtm_media_seconds_total {self.media_seconds:.3f}"]
+        return "\n".join(lines) + "\n"
+
+def serve_metrics(metrics, port, host="127.0.0.1"):
+    """Запускає GET /metrics у фоновому потоці; повертає сервер, щоб його можна було зупинити."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,108 @@
+"""Робота з MP3 на рівні кадрів: розбір заголовків і склеювання сегментів з правильним Xing/LAME заголовком."""
+import struct
+
+MPEG1_BITRATES = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320]
+MPEG2_BITRATES = [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+MPEG1_RATES = [44100, 48000, 32000]
+# Затримка libmp3lame на початку потоку: 576 семплів енкодера + 529 декодера
+ENCODER_DELAY = 576
+DECODER_DELAY = 529
+
+def parse_header(data, pos):
+    """Повертає (довжина кадру, семплів у кадрі) для заголовка Layer III або None."""
+    if pos + 4 > len(data) or data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+        return None
+    version = (data[pos + 1] >> 3) & 0x3  # 3 - MPEG1, 2 - MPEG2, 0 - MPEG2.5
+    layer = (data[pos + 1] >> 1) & 0x3
+    bitrate_index = data[pos + 2] >> 4
+    rate_index = (data[pos + 2] >> 2) & 0x3
+    padding = (data[pos + 2] >> 1) & 0x1
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    if version == 3:
+        bitrate = MPEG1_BITRATES[bitrate_index] * 1000
+        rate = MPEG1_RATES[rate_index]
+        return 144 * bitrate // rate + padding, 1152
+    bitrate = MPEG2_BITRATES[bitrate_index] * 1000
+    rate = MPEG1_RATES[rate_index] // (2 if version == 2 else 4)
+    return 72 * bitrate // rate + padding, 576
+
+def _skip_id3(data):
+    if data[:3] != b'ID3' or len(data) < 10:
+        return 0
+    size = 0
+    for b in data[6:10]:
+        size = (size << 7) | (b & 0x7F)
+    return 10 + size
+
+def split_frames(data):
+    """Ділить MP3 на кадри; повертає (Info-кадр або None, список (позиція, довжина) кадрів зі звуком)."""
+    pos = _skip_id3(data)
+    frames = []
+    while pos < len(data):
+        header = parse_header(data, pos)
+        if header is None:
+            break
+        frames.append((pos, header[0]))
+        pos += header[0]
+    info = None
+    if frames:
+        first_pos, first_len = frames[0]
+        if _xing_offset(data[first_pos:first_pos + first_len]) is not None:
+            info = data[first_pos:first_pos + first_len]
+            frames.pop(0)
+    return info, frames
+
+def _xing_offset(frame):
+    for tag in (b'Xing', b'Info'):
+        offset = frame.find(tag, 4, 64)
+        if offset != -1:
+            return offset
+    return None
+
+def _crc16(data):
+    # CRC-16/ARC, як у LAME-тегу
+    crc = 0
+    for b in data:
+        crc ^= b
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+def build_info_frame(template, frame_lengths, total_samples, samples_per_frame):
+    """Переписує Info-кадр: кількість кадрів, байтів, TOC та паддінг під склеєний потік."""
+    frame = bytearray(template)
+    offset = _xing_offset(frame)
+    flags = struct.unpack('>I', frame[offset + 4:offset + 8])[0]
+    total_bytes = len(frame) + sum(frame_lengths)
+    pos = offset + 8
+    if flags & 0x1:
+        frame[pos:pos + 4] = struct.pack('>I', len(frame_lengths))
+        pos += 4
+    if flags & 0x2:
+        frame[pos:pos + 4] = struct.pack('>I', total_bytes)
+        pos += 4
+    if flags & 0x4:
+        # TOC: позиція у файлі (з 256) для кожного відсотка тривалості
+        starts = []
+        position = len(frame)
+        for length in frame_lengths:
+            starts.append(position)
+            position += length
+        for i in range(100):
+            index = min(len(frame_lengths) - 1, i * len(frame_lengths) // 100) if frame_lengths else 0
+            frame[pos + i] = min(255, starts[index] * 256 // total_bytes) if frame_lengths else 0
+        pos += 100
+    if flags & 0x8:
+        pos += 4
+    lame = pos
+    if frame[lame:lame + 4] in (b'LAME', b'Lavc', b'Lavf') and lame + 36 <= len(frame):
+        # Декодер відкидає ENCODER_DELAY + 529 семплів на початку і padding - 529 у кінці
+        padding = len(frame_lengths) * samples_per_frame - ENCODER_DELAY - total_samples
+        padding = max(0, min(padding, 0xFFF))
+        frame[lame + 21:lame + 24] = ((ENCODER_DELAY << 12) | padding).to_bytes(3, 'big')
+        frame[lame + 28:lame + 32] = struct.pack('>I', total_bytes)
+        # CRC музичних даних лишається від першого сегмента: декодери його не перевіряють,
+        # а рахувати CRC усього файлу на Python - це секунди на кожну годину звуку
+        frame[lame + 34:lame + 36] = struct.pack('>H', _crc16(frame[:lame + 34]))
+    return bytes(frame)
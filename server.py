@@ -0,0 +1,336 @@
+"""Локальний HTTP API черги: інші сервіси надсилають конвертації, стежать за прогресом і забирають результат.
+
+    POST   /jobs                {"source": "...", "trim": 3, "formats": ["mp3"], "trim_silence": false, "trim_leading": false,
+                                 "loudness": -14}
+    GET    /jobs                завдання цього запуску, новіші спершу
+    GET    /jobs/<id>           стан завдання (і завдань минулих запусків, якщо ведеться журнал)
+    GET    /jobs/<id>/events    прогрес як Server-Sent Events до завершення
+    GET    /jobs/<id>/result    готовий файл; ?format=opus, якщо форматів кілька
+    DELETE /jobs/<id>           скасувати
+    GET    /metrics             метрики Prometheus
+
+Мережа обслуговується одним циклом asyncio, а все, що блокує (SQLite, читання файлів), іде в обмежений пул потоків.
+Коли незавершених завдань max_pending, нові отримують 503 з Retry-After замість того, щоб чекати в нескінченній черзі.
+"""
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, quote, urlsplit
+
+from engine import DEFAULT_FORMATS, DEFAULT_LOUDNESS, Job, JobQueue, JobSpec, report_fields
+
+DEFAULT_PORT = 8787
+DEFAULT_MAX_PENDING = 64
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024
+REQUEST_TIMEOUT = 10.0
+KEEP_ALIVE_TIMEOUT = 30.0
+SSE_INTERVAL = 0.2  # не частіше п'яти подій на секунду для одного клієнта
+SSE_HEARTBEAT = 15.0
+RETRY_AFTER = 5
+CHUNK_BYTES = 256 * 1024
+IO_WORKERS = 4
+RECENT_JOBS = 100
+# Скільки завершених завдань тримати в пам'яті; старіші з журналом читаються з store
+KEEP_FINISHED = 1000
+CONTENT_TYPES = {"mp3": "audio/mpeg", "m4a": "audio/mp4", "opus": "audio/ogg", "wav": "audio/wav"}
+
+class HttpError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+def describe(job):
+    """Стан завдання для відповіді API."""
+    state = {"id": job.id, "source": job.spec.source, "title": job.title, "status": job.status,
+             "progress": round(job.progress, 1)}
+    if job.status == "done":
+        state["outputs"] = {fmt: os.path.basename(path) for fmt, path in job.outputs.items()}
+        state["cached"] = job.cached
+        state["skipped"] = job.skipped
+        if job.loudness:
+            state["loudness"] = job.loudness
+        if job.report:
+            state["report"] = report_fields(job)
+    elif job.status == "error":
+        state["error"] = job.error
+    if job.speed:
+        state["speed"] = round(job.speed, 2)
+    if job.eta is not None:
+        state["eta"] = round(job.eta, 1)
+    if job.children:
+        state["entries"] = [child.id for child in job.children]
+    return state
+
+def _describe_row(row):
+    state = {"id": row["id"], "source": row["source"], "title": row["title"], "status": row["status"]}
+    if row["status"] == "done":
+        state["outputs"] = {fmt: os.path.basename(path) for fmt, path in row["outputs"].items()}
+    elif row["error"]:
+        state["error"] = row["error"]
+    return state
+
+class JobServer:
+    """HTTP-обгортка над JobQueue; ліміти черги ті самі, що й у вікні та CLI."""
+    def __init__(self, output_dir, cache=None, metrics=None, store=None, max_pending=DEFAULT_MAX_PENDING, **limits):
+        self.output_dir = output_dir
+        self.metrics = metrics
+        self.store = store
+        self.max_pending = max_pending
+        self.queue = JobQueue(on_update=self._on_update, cache=cache, metrics=metrics, store=store, **limits)
+        self.io = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="api-io")
+        self.lock = threading.Lock()
+        self.jobs = {}  # id -> Job цього запуску, разом з елементами плейлистів
+        self.active = set()  # id незавершених завдань
+        self.finished = {}  # id завершених завдань у порядку завершення (dict як впорядкована множина)
+        self._listeners = {}  # id -> set(asyncio.Event) відкритих потоків подій
+        self.loop = None
+
+    def _on_update(self, job):
+        # Робочі потоки черги лише будять цикл; стан читається вже з циклу
+        with self.lock:
+            self.jobs.setdefault(job.id, job)
+            if job.finished:
+                self.active.discard(job.id)
+                self.finished[job.id] = None
+                while len(self.finished) > KEEP_FINISHED:
+                    oldest = next(iter(self.finished))
+                    del self.finished[oldest]
+                    self.jobs.pop(oldest, None)
+            else:
+                self.active.add(job.id)
+            notify = job.id in self._listeners
+        if notify and self.loop:
+            self.loop.call_soon_threadsafe(self._wake, job.id)
+
+    def _wake(self, job_id):
+        for event in self._listeners.get(job_id, ()):
+            event.set()
+
+    async def run(self, host="127.0.0.1", port=DEFAULT_PORT):
+        self.loop = asyncio.get_running_loop()
+        self.loop.set_default_executor(self.io)
+        server = await asyncio.start_server(self._handle, host, port, limit=MAX_HEADER_BYTES)
+        async with server:
+            await server.serve_forever()
+
+    def shutdown(self):
+        self.queue.interrupt()
+        self.queue.wait(timeout=5)
+        self.queue.shutdown()
+        self.io.shutdown(wait=False)
+
+    async def _handle(self, reader, writer):
+        keep_alive = True
+        try:
+            while keep_alive:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT)
+                except asyncio.LimitOverrunError:
+                    await self._send_json(writer, 431, {"error": "Заголовки запиту завеликі"}, False)
+                    break
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    break
+                keep_alive = False  # поки запит не розібрано, після помилки з'єднання закривається
+                try:
+                    method, target, version, headers = self._parse_head(head)
+                    keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                    try: length = int(headers.get("content-length") or 0)
+                    except ValueError: raise HttpError(400, "Некоректний Content-Length")
+                    if length > MAX_BODY_BYTES:
+                        keep_alive = False
+                        raise HttpError(413, "Тіло запиту завелике")
+                    body = await asyncio.wait_for(reader.readexactly(length), REQUEST_TIMEOUT) if length else b""
+                    keep_alive = await self._route(writer, method, target, body, keep_alive)
+                except HttpError as e:
+                    await self._send_json(writer, e.status, {"error": str(e)}, keep_alive, e.headers)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except Exception as e:
+                    await self._send_json(writer, 500, {"error": f"{type(e).__name__}: {e}"}, False)
+                    break
+        except ConnectionError: pass
+        finally:
+            writer.close()
+
+    def _parse_head(self, head):
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            raise HttpError(400, "Некоректний рядок запиту")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        return method, target, version, headers
+
+    async def _route(self, writer, method, target, body, keep_alive):
+        url = urlsplit(target)
+        parts = [part for part in url.path.split("/") if part]
+        query = parse_qs(url.query)
+        if parts == ["jobs"] and method == "POST":
+            status, payload, headers = await self._submit(body)
+            return await self._send_json(writer, status, payload, keep_alive, headers)
+        if parts == ["jobs"] and method == "GET":
+            with self.lock:
+                jobs = list(self.jobs.values())[-RECENT_JOBS:]
+            return await self._send_json(writer, 200, [describe(job) for job in reversed(jobs)], keep_alive)
+        if parts == ["metrics"] and method == "GET" and self.metrics:
+            return await self._send(writer, 200, self.metrics.render().encode("utf-8"),
+                                    "text/plain; version=0.0.4; charset=utf-8", keep_alive)
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            action = parts[2] if len(parts) == 3 else None
+            if method == "GET" and action is None:
+                return await self._send_json(writer, 200, await self._state(parts[1]), keep_alive)
+            if method == "DELETE" and action is None:
+                job = self._job(parts[1])
+                await self.loop.run_in_executor(None, self.queue.cancel, job)
+                return await self._send_json(writer, 202, describe(job), keep_alive)
+            if method == "GET" and action == "events":
+                await self._events(writer, self._job(parts[1]))
+                return False
+            if method == "GET" and action == "result":
+                return await self._result(writer, parts[1], (query.get("format") or [None])[0], keep_alive)
+        raise HttpError(404 if method in ("GET", "POST", "DELETE") else 405, "Невідомий запит")
+
+    def _job(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            raise HttpError(404, "Завдання не знайдено")
+        return job
+
+    async def _state(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is not None:
+            return describe(job)
+        row = await self.loop.run_in_executor(None, self.store.get, job_id) if self.store else None
+        if row is None:
+            raise HttpError(404, "Завдання не знайдено")
+        return _describe_row(row)
+
+    async def _submit(self, body):
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            raise HttpError(400, "Тіло запиту - не JSON")
+        source = data.get("source") if isinstance(data, dict) else None
+        if not isinstance(source, str) or not source.strip():
+            raise HttpError(400, "Потрібне поле source: посилання або шлях до файлу")
+        source = source.strip()
+        is_url = source.startswith(("http://", "https://"))
+        if not is_url and not os.path.isfile(source):
+            raise HttpError(400, f"Файл не знайдено: {source}")
+        formats = data.get("formats") or DEFAULT_FORMATS
+        if not isinstance(formats, list) or not all(isinstance(value, str) for value in formats):
+            raise HttpError(400, 'Поле formats має бути списком рядків, напр. ["mp3", "opus:96k"]')
+        loudness = data.get("loudness")
+        try:
+            if loudness is True:
+                loudness = DEFAULT_LOUDNESS
+            elif loudness is not None and loudness is not False:
+                loudness = float(loudness)
+            else:
+                loudness = None
+            spec = JobSpec(source, self.output_dir, float(data.get("trim") or 0), is_url,
+                           formats=list(formats),
+                           trim_mode="silence" if data.get("trim_silence") else "fixed",
+                           trim_leading=bool(data.get("trim_leading")), loudness=loudness)
+        except (TypeError, ValueError, AttributeError) as e:
+            raise HttpError(400, f"Некоректні параметри: {e}")
+        with self.lock:
+            if len(self.active) >= self.max_pending:
+                raise HttpError(503, "Черга заповнена, спробуйте пізніше", {"Retry-After": str(RETRY_AFTER)})
+            job = Job(spec)
+            self.jobs[job.id] = job
+            self.active.add(job.id)
+        # Пошук дубліката і запис у журнал - це SQLite, тож не в циклі подій
+        await self.loop.run_in_executor(None, self.queue.submit, job)
+        return (200 if job.finished else 202), describe(job), {"Location": f"/jobs/{job.id}"}
+
+    async def _events(self, writer, job):
+        writer.write(self._head(200, {"Content-Type": "text/event-stream; charset=utf-8",
+                                      "Cache-Control": "no-cache", "Connection": "close"}))
+        event = asyncio.Event()
+        with self.lock:
+            self._listeners.setdefault(job.id, set()).add(event)
+        try:
+            last = None
+            while True:
+                state = describe(job)
+                if state != last:
+                    data = json.dumps(state, ensure_ascii=False)
+                    writer.write(f"event: {job.status}\ndata: {data}\n\n".encode("utf-8"))
+                    await writer.drain()
+                    last = state
+                if job.finished:
+                    break
+                try:
+                    await asyncio.wait_for(event.wait(), SSE_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    writer.write(b": ping\n\n")
+                    await writer.drain()
+                    continue
+                # Усі оновлення за SSE_INTERVAL зливаються в одну подію з найновішим станом
+                await asyncio.sleep(SSE_INTERVAL)
+                event.clear()
+        finally:
+            with self.lock:
+                listeners = self._listeners.get(job.id)
+                listeners.discard(event)
+                if not listeners:
+                    del self._listeners[job.id]
+
+    async def _result(self, writer, job_id, fmt, keep_alive):
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is not None:
+            status, outputs = job.status, job.outputs
+        else:
+            row = await self.loop.run_in_executor(None, self.store.get, job_id) if self.store else None
+            if row is None:
+                raise HttpError(404, "Завдання не знайдено")
+            status, outputs = row["status"], row["outputs"]
+        if status != "done":
+            raise HttpError(409, f"Завдання ще не готове: {status}")
+        fmt = fmt or next(iter(outputs), None)
+        path = outputs.get(fmt)
+        if not path or not os.path.exists(path):
+            raise HttpError(404, f"Немає результату у форматі {fmt}")
+        size = os.path.getsize(path)
+        name = quote(os.path.basename(path))
+        writer.write(self._head(200, {"Content-Type": CONTENT_TYPES.get(fmt, "application/octet-stream"),
+                                      "Content-Length": str(size),
+                                      "Content-Disposition": f"attachment; filename*=UTF-8''{name}",
+                                      "Connection": "keep-alive" if keep_alive else "close"}))
+        with open(path, "rb") as f:
+            while True:
+                chunk = await self.loop.run_in_executor(None, f.read, CHUNK_BYTES)
+                if not chunk:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+        return keep_alive
+
+    def _head(self, status, headers):
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"] + [f"{name}: {value}" for name, value in headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _send(self, writer, status, body, content_type, keep_alive, headers=None):
+        head = {"Content-Type": content_type, "Content-Length": str(len(body)),
+                "Connection": "keep-alive" if keep_alive else "close"}
+        head.update(headers or {})
+        writer.write(self._head(status, head) + body)
+        await writer.drain()
+        return keep_alive
+
+    async def _send_json(self, writer, status, payload, keep_alive, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        return await self._send(writer, status, body, "application/json; charset=utf-8", keep_alive, headers)
@@ -0,0 +1,95 @@
+"""Пошук тиші на початку та в кінці запису: RMS по блоках PCM на NumPy, потоком і з обмеженою пам'яттю."""
+import subprocess
+from typing import NamedTuple
+
+import numpy as np
+
+from engine import _popen_flags, get_ffmpeg_exe, probe_media
+
+# Для порогу гучності вистачає моно 8 кГц: декодувати й рахувати в рази менше, ніж 44,1 кГц стерео
+ANALYSIS_RATE = 8000
+BLOCK_SECONDS = 0.05
+READ_BYTES = ANALYSIS_RATE * 2 * 10  # 10 с PCM за одне читання
+SILENCE_DB = -50.0
+MIN_SILENCE = 0.5  # коротші паузи не обрізаємо
+PAD_SECONDS = 0.15  # запас, щоб не зрізати затухання звуку
+EDGE_WINDOW = 60.0  # спершу аналізуємо лише останню (чи першу) хвилину
+
+class Bounds(NamedTuple):
+    start: float
+    end: float
+    duration: float
+
+def _loud_blocks(source, offset, length):
+    """Декодує (offset, offset + length) і повертає маску блоків, гучніших за SILENCE_DB."""
+    cmd = [get_ffmpeg_exe(), "-hide_banner", "-nostdin", "-loglevel", "error"]
+    if offset > 0:
+        cmd += ["-ss", f"{offset:.3f}"]
+    cmd += ["-i", source, "-vn", "-map", "0:a:0", "-t", f"{length:.3f}",
+            "-f", "s16le", "-ac", "1", "-ar", str(ANALYSIS_RATE), "pipe:1"]
+    block = int(ANALYSIS_RATE * BLOCK_SECONDS)
+    # Порівнюємо середній квадрат з квадратом порогу - без кореня та логарифма на кожен блок
+    threshold = (10 ** (SILENCE_DB / 20) * 32768) ** 2
+    masks = []
+    pending = b""  # непарний байт і неповний блок переходять у наступне читання
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, creationflags=_popen_flags())
+    try:
+        while True:
+            chunk = proc.stdout.read(READ_BYTES)
+            if not chunk:
+                break
+            data = pending + chunk
+            usable = len(data) // (block * 2) * block * 2
+            pending = data[usable:]
+            if usable:
+                blocks = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32).reshape(-1, block)
+                masks.append(np.einsum("ij,ij->i", blocks, blocks) / block > threshold)
+        if len(pending) >= 2:
+            tail = np.frombuffer(pending[:len(pending) // 2 * 2], dtype="<i2").astype(np.float32)
+            masks.append(np.array([np.dot(tail, tail) / len(tail) > threshold]))
+        err = proc.stderr.read().decode(errors="replace")
+        proc.wait()
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+    if proc.returncode != 0:
+        raise RuntimeError(err.strip() or f"ffmpeg завершився з кодом {proc.returncode}")
+    return np.concatenate(masks) if masks else np.zeros(0, dtype=bool)
+
+def _last_sound(source, duration):
+    """Кінець останнього гучного блоку; вікно аналізу зростає, лише якщо воно все тихе."""
+    window = EDGE_WINDOW
+    while True:
+        offset = max(0.0, duration - window)
+        loud = np.flatnonzero(_loud_blocks(source, offset, duration - offset))
+        if loud.size:
+            return min(duration, offset + float(loud[-1] + 1) * BLOCK_SECONDS)
+        if offset == 0:
+            return None
+        window *= 4
+
+def _first_sound(source, limit):
+    window = EDGE_WINDOW
+    while True:
+        length = min(window, limit)
+        loud = np.flatnonzero(_loud_blocks(source, 0.0, length))
+        if loud.size:
+            return float(loud[0]) * BLOCK_SECONDS
+        if length >= limit:
+            return None
+        window *= 4
+
+def find_bounds(source, leading=False):
+    """Повертає межі звуку без тиші в кінці (і на початку, якщо leading); тихий файл не обрізається."""
+    duration = probe_media(source).duration
+    if not duration:
+        return Bounds(0.0, 0.0, 0.0)
+    end = _last_sound(source, duration)
+    if end is None:
+        return Bounds(0.0, duration, duration)
+    end = duration if duration - end < MIN_SILENCE else min(duration, end + PAD_SECONDS)
+    start = 0.0
+    if leading:
+        first = _first_sound(source, end) or 0.0
+        start = 0.0 if first < MIN_SILENCE else max(0.0, first - PAD_SECONDS)
+    return Bounds(start, end, duration)
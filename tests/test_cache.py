@@ -0,0 +1,35 @@
+import os
+
+from cache import ConversionCache
+
+def _mp3(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(b"\0" * size)
+    return str(path)
+
+def test_instances_share_one_index(tmp_path):
+    directory = str(tmp_path / "cache")
+    first, second = ConversionCache(directory, 10000), ConversionCache(directory, 10000)
+    first.put("a", _mp3(tmp_path, "a.mp3", 100))
+    second.put("b", _mp3(tmp_path, "b.mp3", 100))
+    # Запис другого екземпляра не затирає запис першого
+    third = ConversionCache(directory, 10000)
+    assert third.get("a", str(tmp_path / "a.out")) and third.get("b", str(tmp_path / "b.out"))
+
+def test_orphaned_files_count_towards_limit(tmp_path):
+    directory = tmp_path / "cache"
+    directory.mkdir()
+    for key in "xyz":
+        (directory / f"{key}.mp3").write_bytes(b"\0" * 400)
+    cache = ConversionCache(str(directory), 1000)
+    assert sum(name.endswith(".mp3") for name in os.listdir(directory)) == 2
+    cache.put("new", _mp3(tmp_path, "new.mp3", 400))
+    assert sum(name.endswith(".mp3") for name in os.listdir(directory)) == 2
+    assert cache.get("new", str(tmp_path / "new.out"))
+
+def test_missing_file_is_a_miss(tmp_path):
+    cache = ConversionCache(str(tmp_path / "cache"))
+    cache.put("a", _mp3(tmp_path, "a.mp3", 100))
+    os.remove(os.path.join(cache.directory, "a.mp3"))
+    assert not cache.get("a", str(tmp_path / "a.out"))
+    assert not cache.get("a", str(tmp_path / "a.out"))
@@ -0,0 +1,58 @@
+import subprocess
+
+import pytest
+
+from engine import Job, JobQueue, JobSpec, get_ffmpeg_exe
+from jobstore import JobStore
+
+pytestmark = pytest.mark.skipif(get_ffmpeg_exe() is None, reason="потрібен ffmpeg")
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "tone.wav"
+    subprocess.run([get_ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-f", "lavfi",
+                    "-i", "sine=frequency=440:duration=3", str(path)], check=True)
+    return str(path)
+
+def _queue(tmp_path, finished):
+    def on_update(job):
+        if job.finished and job.id not in finished:
+            finished.append(job.id)
+    return JobQueue(1, 1, on_update, store=JobStore(str(tmp_path / "jobs.sqlite3")))
+
+def test_duplicate_of_finished_job_reuses_its_files(tmp_path, source):
+    queue = _queue(tmp_path, [])
+    first = Job(JobSpec(source, str(tmp_path / "out"), 0))
+    queue.submit(first)
+    queue.wait()
+    second = Job(JobSpec(source, str(tmp_path / "out"), 0))
+    queue.submit(second)
+    queue.wait()
+    queue.shutdown()
+    assert first.status == second.status == "done"
+    assert second.skipped and second.outputs == first.outputs
+
+def test_duplicate_of_running_job_waits_for_its_result(tmp_path, source):
+    finished = []
+    queue = _queue(tmp_path, finished)
+    first, second = (Job(JobSpec(source, str(tmp_path / "out"), 0)) for _ in range(2))
+    queue.submit(first)
+    queue.submit(second)
+    assert not second.finished
+    queue.wait()
+    queue.shutdown()
+    assert finished == [first.id, second.id]
+    assert first.status == second.status == "done"
+    assert second.outputs == first.outputs and list(first.outputs) == ["mp3"]
+
+def test_duplicate_of_running_job_shares_its_failure(tmp_path):
+    broken = tmp_path / "broken.mp4"
+    broken.write_bytes(b"not a video" * 1000)
+    queue = _queue(tmp_path, [])
+    first, second = (Job(JobSpec(str(broken), str(tmp_path / "out"), 0)) for _ in range(2))
+    queue.submit(first)
+    queue.submit(second)
+    queue.wait()
+    queue.shutdown()
+    assert first.status == second.status == "error"
+    assert second.error == first.error
@@ -0,0 +1,52 @@
+import threading
+
+from engine import Job, JobQueue, JobSpec
+
+def _queue(started, release):
+    queue = JobQueue(2, 1, lambda job: None, host_limit=1)
+
+    def fetch(job):
+        started.append(job.spec.source)
+        release.wait(10)
+        queue._complete(job)
+    queue._fetch = fetch  # лише черга, без мережі
+    return queue
+
+def _wait_for(condition):
+    event = threading.Event()
+    for _ in range(100):
+        if condition():
+            return True
+        event.wait(0.05)
+    return False
+
+def test_full_host_does_not_hold_download_threads(tmp_path):
+    started, release = [], threading.Event()
+    queue = _queue(started, release)
+    jobs = [Job(JobSpec(url, str(tmp_path))) for url in
+            ("https://a.example/1", "https://a.example/2", "https://b.example/1")]
+    for job in jobs:
+        queue.submit(job)
+    # Друге завдання з a.example чекає без потоку, тож b.example іде паралельно з першим
+    assert _wait_for(lambda: len(started) == 2)
+    assert started == ["https://a.example/1", "https://b.example/1"]
+    release.set()
+    assert queue.wait(10)
+    queue.shutdown()
+    assert started[2] == "https://a.example/2"
+    assert all(job.status == "done" for job in jobs)
+
+def test_job_waiting_for_host_cancels_at_once(tmp_path):
+    started, release = [], threading.Event()
+    queue = _queue(started, release)
+    first, second, third = (Job(JobSpec(f"https://a.example/{n}", str(tmp_path))) for n in range(3))
+    for job in (first, second, third):
+        queue.submit(job)
+    assert _wait_for(lambda: started)
+    assert _wait_for(lambda: len(queue._host_waiting.get("a.example", ())) == 2)
+    queue.cancel(second)
+    assert second.status == "cancelled"
+    release.set()
+    assert queue.wait(10)
+    queue.shutdown()
+    assert started == ["https://a.example/0", "https://a.example/2"]
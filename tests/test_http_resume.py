@@ -0,0 +1,71 @@
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import engine
+
+DATA = bytes(range(256)) * 2000  # 512000 байт
+
+class FlakyServer:
+    """Віддає DATA з підтримкою Range, але кожну відповідь з нового зсуву обриває на півдорозі."""
+    def __init__(self):
+        self.ranges = []  # заголовки Range усіх запитів по черзі
+        self.dropped = set()  # зсуви, з яких уже обривали
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                header = self.headers.get("Range")
+                server.ranges.append(header)
+                start, end = 0, len(DATA) - 1
+                match = re.fullmatch(r"bytes=(\d+)-(\d*)", header or "")
+                if match:
+                    start = int(match[1])
+                    end = min(end, int(match[2])) if match[2] else end
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(DATA)}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Length", str(end - start + 1))
+                self.end_headers()
+                body = DATA[start:end + 1]
+                if start not in server.dropped:
+                    server.dropped.add(start)
+                    body = body[:len(body) // 2]  # Content-Length обіцяє більше, ніж прийде
+                self.wfile.write(body)
+                self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/file.bin"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(engine, "HTTP_RETRY_DELAY", 0)
+    monkeypatch.setattr(engine, "HTTP_CHUNK", 200000)
+    monkeypatch.setattr(engine, "STREAM_CHUNK", 4096)
+    flaky = FlakyServer()
+    yield flaky
+    flaky.close()
+
+def test_resumes_open_ended_download_without_size(server):
+    assert b"".join(engine.iter_http_chunks(server.url, None)) == DATA
+    # Перший запит без Range, далі - докачування з місця обриву
+    assert server.ranges[0] is None
+    assert server.ranges[1] == f"bytes={len(DATA) // 2}-"
+    assert all(header.endswith("-") for header in server.ranges[1:])
+
+def test_resumes_ranged_download_with_size(server):
+    assert b"".join(engine.iter_http_chunks(server.url, None, len(DATA))) == DATA
+    assert server.ranges[:2] == ["bytes=0-199999", "bytes=100000-299999"]
+    assert server.ranges[-1].endswith(f"-{len(DATA) - 1}")
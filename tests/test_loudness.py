@@ -0,0 +1,76 @@
+import re
+import subprocess
+
+import numpy as np
+import pytest
+
+import loudness
+from engine import JobSpec, get_ffmpeg_exe
+from loudness import LoudnessMeter, k_weighting
+
+pytestmark = pytest.mark.skipif(get_ffmpeg_exe() is None, reason="потрібен ffmpeg")
+
+# Опубліковані в BS.1770 коефіцієнти для 48 кГц: полиця і фільтр високих частот
+SHELF_48K = ([1.53512485958697, -2.69169618940638, 1.19839281085285], [1.0, -1.69065929318241, 0.73248077421585])
+HIGHPASS_48K = ([1.0, -2.0, 1.0], [1.0, -1.99004745483398, 0.99007225036621])
+
+def _lfilter(b, a, x):
+    y = [0.0] * len(x)
+    for n in range(len(x)):
+        y[n] = sum(b[k] * x[n - k] for k in range(3) if n >= k) - sum(a[k] * y[n - k] for k in range(1, 3) if n >= k)
+    return y
+
+def test_biquads_match_published_48k_coefficients():
+    (shelf_b, shelf_a), (highpass_b, highpass_a) = k_weighting(48000)
+    assert shelf_b == pytest.approx(SHELF_48K[0], abs=1e-9) and shelf_a == pytest.approx(SHELF_48K[1], abs=1e-9)
+    assert highpass_b == pytest.approx(HIGHPASS_48K[0], abs=1e-9)
+    assert highpass_a == pytest.approx(HIGHPASS_48K[1], abs=1e-9)
+
+@pytest.mark.parametrize("channels", [1, 2])
+def test_blocked_filter_matches_sample_by_sample_iir(monkeypatch, channels):
+    rate = 8000
+    monkeypatch.setattr(loudness, "BATCH_SAMPLES", 3 * 800 * channels)  # кілька пачок і блоків у кожній
+    samples = np.random.default_rng(1).integers(-20000, 20000, size=(rate * 2, channels), dtype="<i2")
+    meter = LoudnessMeter(rate, channels)
+    pcm = samples.tobytes()
+    for start in range(0, len(pcm), 7_001):
+        meter.feed(pcm[start:start + 7_001])
+    meter.result()
+    expected = np.zeros(len(samples) // 800)
+    for c in range(channels):
+        weighted = [value / 32768 for value in samples[:, c]]
+        for b, a in k_weighting(rate):
+            weighted = _lfilter(b, a, weighted)
+        expected += np.square(weighted).reshape(-1, 800).mean(axis=1)
+    assert np.concatenate(meter.energies) == pytest.approx(expected, rel=1e-9)
+
+def _pcm(source, rate, channels):
+    return subprocess.run([get_ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-f", "lavfi", "-i", source,
+                           "-f", "s16le", "-ar", str(rate), "-ac", str(channels), "pipe:1"],
+                          capture_output=True, check=True).stdout
+
+def _ffmpeg_lufs(pcm, rate, channels):
+    result = subprocess.run([get_ffmpeg_exe(), "-hide_banner", "-nostats", "-f", "s16le", "-ar", str(rate),
+                             "-ac", str(channels), "-i", "pipe:0", "-af", "ebur128=framelog=quiet", "-f", "null", "-"],
+                            input=pcm, capture_output=True, check=True)
+    return float(re.findall(r"I:\s+(-?[\d.]+) LUFS", result.stderr.decode())[-1])
+
+@pytest.mark.parametrize("source", [
+    "sine=frequency=1000:duration=30",
+    "sine=frequency=25:duration=30",
+    "anoisesrc=color=pink:amplitude=0.3:duration=30",
+    "anoisesrc=color=white:amplitude=0.2:duration=30",
+])
+@pytest.mark.parametrize("rate, channels", [(48000, 2), (44100, 1)])
+def test_integrated_loudness_matches_ffmpeg_ebur128(source, rate, channels):
+    pcm = _pcm(source, rate, channels)
+    meter = LoudnessMeter(rate, channels)
+    for start in range(0, len(pcm), 100_000):  # шматки не кратні блоку, як із труби декодера
+        meter.feed(pcm[start:start + 100_000])
+    # ffmpeg друкує одну цифру після коми
+    assert meter.result().integrated == pytest.approx(_ffmpeg_lufs(pcm, rate, channels), abs=0.1)
+
+@pytest.mark.parametrize("target", [float("nan"), float("inf"), -float("inf"), 3.0, -90.0])
+def test_rejects_target_outside_lufs_range(target):
+    with pytest.raises(ValueError):
+        JobSpec("song.mp4", ".", 0, loudness=target)
@@ -0,0 +1,83 @@
+import asyncio
+import http.client
+import json
+import socket
+import subprocess
+import threading
+
+import pytest
+
+from engine import get_ffmpeg_exe
+from server import JobServer
+
+pytestmark = pytest.mark.skipif(get_ffmpeg_exe() is None, reason="потрібен ffmpeg")
+
+def _tone(path, seconds):
+    subprocess.run([get_ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-f", "lavfi",
+                    "-i", f"sine=frequency=440:duration={seconds}", str(path)], check=True)
+    return str(path)
+
+async def _cancel_tasks():
+    tasks = asyncio.all_tasks() - {asyncio.current_task()}
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+@pytest.fixture
+def api(tmp_path):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = JobServer(str(tmp_path / "out"), max_pending=1, download_workers=1, encode_workers=1)
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    running = asyncio.run_coroutine_threadsafe(server.run(port=port), loop)
+
+    def request(method, path, payload=None):
+        for _ in range(50):
+            try:
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                connection.request(method, path, json.dumps(payload) if payload is not None else None)
+                return connection.getresponse()
+            except ConnectionRefusedError:
+                threading.Event().wait(0.1)  # сервер ще стартує
+        raise AssertionError("сервер не запустився")
+    yield request
+    server.shutdown()
+    asyncio.run_coroutine_threadsafe(_cancel_tasks(), loop).result(10)
+    loop.call_soon_threadsafe(loop.stop)
+    assert running.cancelled()
+
+def test_formats_must_be_a_list_of_strings(api, tmp_path):
+    source = _tone(tmp_path / "tone.wav", 1)
+    for formats in ("mp3", ["mp3", 3], {"mp3": True}):
+        response = api("POST", "/jobs", {"source": source, "formats": formats})
+        assert response.status == 400
+        assert "formats" in json.loads(response.read())["error"]
+
+def test_submit_events_and_result(api, tmp_path):
+    response = api("POST", "/jobs", {"source": _tone(tmp_path / "tone.wav", 3), "formats": ["mp3"]})
+    assert response.status == 202
+    location = response.getheader("Location")
+    job_id = json.loads(response.read())["id"]
+    assert location == f"/jobs/{job_id}"
+    events = api("GET", f"{location}/events")
+    assert events.getheader("Content-Type").startswith("text/event-stream")
+    names = [line[len("event: "):] for line in events.read().decode("utf-8").splitlines() if line.startswith("event: ")]
+    assert names[-1] == "done"
+    result = api("GET", f"{location}/result")
+    assert result.status == 200 and result.getheader("Content-Type") == "audio/mpeg"
+    assert len(result.read()) > 10000
+
+def test_full_queue_answers_503_and_delete_cancels(api, tmp_path):
+    response = api("POST", "/jobs", {"source": _tone(tmp_path / "long.wav", 600)})
+    assert response.status == 202
+    location = response.getheader("Location")
+    response.read()
+    busy = api("POST", "/jobs", {"source": _tone(tmp_path / "tone.wav", 1)})
+    assert busy.status == 503 and busy.getheader("Retry-After")
+    busy.read()
+    assert api("DELETE", location).status == 202
+    events = api("GET", f"{location}/events").read().decode("utf-8")
+    assert "event: cancelled" in events
+    assert api("GET", f"{location}/result").status == 409
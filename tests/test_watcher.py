@@ -0,0 +1,62 @@
+import os
+import subprocess
+import time
+from dataclasses import replace
+
+import pytest
+
+from engine import Job, JobQueue, JobSpec, get_ffmpeg_exe
+from jobstore import JobStore
+from watcher import FolderWatcher
+
+pytestmark = pytest.mark.skipif(get_ffmpeg_exe() is None, reason="потрібен ffmpeg")
+
+def _tone(path, seconds):
+    subprocess.run([get_ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-y", "-f", "lavfi",
+                    "-i", f"sine=frequency=440:duration={seconds}", "-f", "matroska", str(path)], check=True)
+
+def _wait(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.1)
+
+@pytest.fixture
+def watch(tmp_path):
+    root, out = tmp_path / "in", tmp_path / "out"
+    root.mkdir()
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    queue = JobQueue(1, 1, lambda job: None, store=store)
+    jobs = []
+
+    def submit(path, previous):
+        job = Job(replace(JobSpec(path, str(out), 0), replaces=previous))
+        jobs.append(job)
+        queue.submit(job)
+        return job
+    watcher = FolderWatcher(str(root), submit, store, stable_seconds=0.2)
+    watcher.start()
+    yield root, out, store, jobs
+    watcher.stop()
+    queue.shutdown()
+
+def test_failed_file_is_not_recorded(watch):
+    root, out, store, jobs = watch
+    (root / "broken.mkv").write_bytes(b"not a video" * 1000)
+    _wait(lambda: jobs and jobs[0].finished)
+    time.sleep(1)
+    assert jobs[0].status == "error"
+    assert store.watched_files(str(root)) == {}
+
+def test_changed_file_replaces_its_own_output(watch):
+    root, out, store, jobs = watch
+    source = root / "REC001.mkv"
+    _tone(source, 2)
+    _wait(lambda: str(source) in store.watched_files(str(root)))
+    first_size = os.path.getsize(out / "REC001.mp3")
+    _tone(source, 6)
+    _wait(lambda: len(jobs) == 2 and jobs[1].finished)
+    assert jobs[1].status == "done"
+    assert os.listdir(out) == ["REC001.mp3"]
+    assert os.path.getsize(out / "REC001.mp3") > first_size
+    _wait(lambda: store.watched_files(str(root))[str(source)][0] == os.path.getsize(source))
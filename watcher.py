@@ -0,0 +1,198 @@
+"""Стеження за папкою: нові та змінені відео йдуть у чергу, щойно файл перестав рости.
+
+Події файлової системи дає watchdog (inotify, ReadDirectoryChangesW, FSEvents), якщо він встановлений;
+без нього папка переглядається раз на POLL_SECONDS. Індекс уже сконвертованих файлів живе в JobStore,
+тож після перезапуску звіряються лише розмір і час зміни, без повторної конвертації; файл, чиє завдання
+не вдалося, після перезапуску пробується знову.
+"""
+import os
+import threading
+import time
+
+from engine import VIDEO_EXTENSIONS
+
+STABLE_SECONDS = 3.0  # стільки розмір і час зміни мають не змінюватись, щоб файл вважався дописаним
+CHECK_SECONDS = 0.5
+POLL_SECONDS = 10.0  # лише без watchdog
+
+def mirrored_output_dir(root, path, output_dir):
+    """Папка результату для файлу з root: та сама вкладена папка під output_dir.
+
+    Так однакові назви з різних підпапок (REC001.mp4 кожної станції) не стають одним REC001.mp3.
+    """
+    relative = os.path.relpath(os.path.dirname(os.path.abspath(path)), os.path.abspath(root))
+    return output_dir if relative == os.curdir else os.path.join(output_dir, relative)
+
+def _load_watchdog():
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        return None
+    return Observer, FileSystemEventHandler
+
+class FolderWatcher:
+    """Викликає on_file(path, previous) з власного потоку для кожного стабільного нового чи зміненого відео.
+
+    previous - результати попередньої конвертації цього файлу, які нове завдання може перезаписати.
+    on_file повертає завдання (або None); файл потрапляє в індекс з розміром і часом зміни, лише коли
+    завдання успішно завершилось.
+    """
+    def __init__(self, root, on_file, store=None, recursive=True, ignore=(), stable_seconds=STABLE_SECONDS):
+        self.root = os.path.abspath(root)
+        self.on_file = on_file
+        self.store = store
+        self.recursive = recursive
+        self.ignore = [os.path.join(os.path.abspath(path), "") for path in ignore if path]
+        self.stable_seconds = stable_seconds
+        self.known = store.watched_files(self.root) if store else {}
+        self.mode = None  # "events" або "polling"
+        self.observer = None
+        self._candidates = {}  # шлях -> (розмір, mtime_ns, коли востаннє змінився)
+        self._queued = {}  # шлях -> (завдання, розмір, mtime_ns), доки завдання не завершилось
+        self._produced = {}  # шлях -> результати останнього успішного завдання в цьому запуску
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name="watch", daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        if self.observer:
+            self.observer.stop()
+        with self._cond:
+            self._cond.notify_all()
+
+    def _run(self):
+        watchdog = _load_watchdog()
+        if watchdog:
+            # Підписуємось до першого перегляду, щоб не пропустити файл, що з'явився між ними
+            Observer, FileSystemEventHandler = watchdog
+            watcher = self
+
+            class Handler(FileSystemEventHandler):
+                def on_created(self, event):
+                    watcher._on_event(event.src_path, event.is_directory)
+
+                def on_modified(self, event):
+                    if not event.is_directory:
+                        watcher._on_event(event.src_path, False)
+
+                def on_moved(self, event):
+                    watcher._on_event(event.dest_path, event.is_directory)
+
+            self.observer = Observer()
+            self.observer.schedule(Handler(), self.root, recursive=self.recursive)
+            self.observer.daemon = True
+            self.observer.start()
+            self.mode = "events"
+        else:
+            self.mode = "polling"
+        self._scan(self.root)
+        last_scan = time.monotonic()
+        while not self._stopped.is_set():
+            with self._cond:
+                # Без кандидатів і завдань у черзі потік спить до наступної події, а не опитує диск
+                if self._candidates or self._queued:
+                    timeout = CHECK_SECONDS
+                else:
+                    timeout = None if self.observer else max(0.0, POLL_SECONDS - (time.monotonic() - last_scan))
+                self._cond.wait(timeout)
+            if self._stopped.is_set():
+                break
+            if not self.observer and time.monotonic() - last_scan >= POLL_SECONDS:
+                self._scan(self.root)
+                last_scan = time.monotonic()
+            self._check_stable()
+            self._check_finished()
+
+    def _on_event(self, path, is_directory):
+        if is_directory:
+            self._scan(path)  # перенесена чи скопійована папка з файлами
+        else:
+            self._consider(path)
+
+    def _ignored(self, path):
+        return any(path.startswith(prefix) for prefix in self.ignore)
+
+    def _scan(self, top):
+        """Звіряє дерево з індексом: лише stat, без читання файлів."""
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".") and not self._ignored(os.path.join(dirpath, d, ""))]
+            for name in filenames:
+                self._consider(os.path.join(dirpath, name))
+            if not self.recursive:
+                break
+
+    def _consider(self, path):
+        path = os.path.abspath(path)
+        name = os.path.basename(path)
+        if not name.lower().endswith(VIDEO_EXTENSIONS) or name.startswith((".", "~")) or self._ignored(path):
+            return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        state = (stat.st_size, stat.st_mtime_ns)
+        if self.known.get(path) == state:
+            return
+        with self._cond:
+            if path not in self._candidates:
+                self._candidates[path] = state + (time.monotonic(),)
+                self._cond.notify_all()
+
+    def _check_stable(self):
+        now = time.monotonic()
+        with self._cond:
+            candidates = list(self._candidates.items())
+        for path, (size, mtime_ns, since) in candidates:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                with self._cond:
+                    self._candidates.pop(path, None)  # файл видалили або перенесли
+                continue
+            state = (stat.st_size, stat.st_mtime_ns)
+            if state != (size, mtime_ns):
+                with self._cond:
+                    self._candidates[path] = state + (now,)
+                continue
+            if now - since < self.stable_seconds:
+                continue
+            if not stat.st_size:
+                with self._cond:
+                    self._candidates.pop(path, None)  # порожній файл повернеться подією, коли в нього почнуть писати
+                continue
+            try:
+                with open(path, "rb"):
+                    pass  # Windows не відкриває файл, який ще пише інша програма
+            except OSError:
+                continue
+            with self._cond:
+                self._candidates.pop(path, None)
+            if self.known.get(path) == state:
+                continue
+            previous = self._produced.get(path)
+            if previous is None and self.store:
+                try: previous = self.store.watched_outputs(path)
+                except Exception: pass
+            job = self.on_file(path, previous or [])
+            # У пам'яті файл відомий одразу: невдале завдання не повторюється на кожному перегляді, лише після перезапуску
+            self.known[path] = state
+            if job is not None:
+                with self._cond:
+                    self._queued[path] = (job, size, mtime_ns)
+
+    def _check_finished(self):
+        with self._cond:
+            finished = [(path, entry) for path, entry in self._queued.items() if entry[0].finished]
+            for path, _ in finished:
+                del self._queued[path]
+        for path, (job, size, mtime_ns) in finished:
+            if job.status != "done":
+                continue
+            self._produced[path] = list(job.outputs.values())
+            if self.store:
+                try: self.store.mark_watched(path, size, mtime_ns, job.id)
+                except Exception: pass